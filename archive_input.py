@@ -0,0 +1,82 @@
+import os
+import zlib
+import posixpath
+import tarfile
+import zipfile
+
+# Errors of a corrupt or truncated archive, raised when a member is read or when a
+# tar stream moves on to the next member.
+READ_ERRORS = (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, OSError)
+
+def is_archive(path):
+    """True for zip files and (optionally compressed) tar files."""
+    return os.path.isfile(path) and (zipfile.is_zipfile(path) or tarfile.is_tarfile(path))
+
+def member_document_name(archive_path, member_path):
+    """
+    Returns the document name of an archive member: '<archive file name>/<member path>'.
+    The full file name keeps bundle.zip and bundle.tar.gz apart. Outputs are named
+    after it, so it must stay inside the output directory; absolute paths and '..'
+    components return None.
+    """
+    path = posixpath.normpath(member_path.replace('\\', '/'))
+    if path.startswith('/') or path == '..' or path.startswith('../'):
+        return None
+    return f"{os.path.basename(archive_path)}/{path}"
+
+def duplicate_archive_names(archive_paths):
+    """Returns the archive file names given more than once; their documents' names would collide."""
+    seen = set()
+    duplicates = []
+    for archive_path in archive_paths:
+        name = os.path.basename(archive_path)
+        if name in seen and name not in duplicates:
+            duplicates.append(name)
+        seen.add(name)
+    return duplicates
+
+def _zip_members(archive_path):
+    with zipfile.ZipFile(archive_path) as archive:
+        for info in archive.infolist():
+            if not info.is_dir():
+                yield info.filename, lambda info=info: archive.read(info)
+
+def _tar_members(archive_path):
+    # Stream mode ('r|*') reads the archive front to back without seeking, which
+    # also works for compressed tars; each member is read before moving on.
+    with tarfile.open(archive_path, 'r|*') as archive:
+        for member in archive:
+            if member.isfile():
+                yield member.name, lambda member=member: archive.extractfile(member).read()
+
+def iter_archive_pdfs(archive_path):
+    """
+    Streams the PDF members of a zip or tar archive in archive order, reading one
+    member into memory at a time.
+
+    A member that cannot be read (bad CRC, corrupt compressed data) is yielded
+    with None instead of its bytes, and the archive carries on. A tar stream that
+    breaks off ends that archive only; the break is yielded as a failed document
+    named after the archive.
+
+    Yields:
+        tuple: (document name, PDF bytes or None); see member_document_name.
+    """
+    try:
+        members = _zip_members(archive_path) if zipfile.is_zipfile(archive_path) else _tar_members(archive_path)
+        for member_path, read in members:
+            if not member_path.lower().endswith('.pdf'):
+                continue
+            name = member_document_name(archive_path, member_path)
+            if name is None:
+                print(f"Skipping archive member with an unsafe path: {member_path}")
+                continue
+            try:
+                data = read()
+            except READ_ERRORS as e:
+                print(f"Error reading {name}: {e}")
+                data = None
+            yield name, data
+    except READ_ERRORS as e:
+        print(f"Error reading archive {archive_path}: {e}; its remaining members are skipped.")
+        yield os.path.basename(archive_path), None
@@ -0,0 +1,85 @@
+"""
+Compares per-span dicts with block_store.BlockStore on synthetic spans: memory
+per span and the time to find heading candidates.
+
+    python benchmarks/bench_block_store.py --spans 10000 100000 500000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from block_store import BlockStore
+from heading_detector import is_bold, find_candidates, find_store_candidates
+
+FONTS = ['Helvetica', 'Helvetica-Bold', 'Times-Roman', 'Times-Bold', 'Courier']
+WORDS = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit']
+
+def make_blocks(span_count, seed=0):
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(span_count):
+        y0 = rng.uniform(0, 780)
+        x0 = rng.uniform(0, 500)
+        size = rng.choice([8] * 4 + [10] * 40 + [12, 14, 18])
+        text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 12)))
+        blocks.append({
+            'bbox': (x0, y0, x0 + 5.0 * len(text), y0 + size),
+            'text': text,
+            'font_size': size,
+            'font_name': rng.choice(FONTS) if rng.random() < 0.05 else 'Times-Roman',
+            'page': i // 200,
+            'is_column_like': rng.random() < 0.2,
+            'is_in_box': rng.random() < 0.05,
+        })
+    return blocks
+
+def measure(build):
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, size
+
+def best_time(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spans', type=int, nargs='+', default=[10000, 100000])
+    args = parser.parse_args(argv)
+
+    body_style = {'size': 10, 'font': 'Times-Roman'}
+    min_font_size = 8
+    print(f"{'spans':>8} {'dict B/span':>12} {'store B/span':>13} {'dict filter ms':>15} {'store filter ms':>16}")
+    for span_count in args.spans:
+        blocks, dict_bytes = measure(lambda: make_blocks(span_count))
+        store, store_bytes = measure(lambda: _build_store(blocks))
+
+        dict_time, dict_candidates = best_time(lambda: find_candidates(blocks, body_style, min_font_size))
+        store_time, store_candidates = best_time(lambda: find_store_candidates(store, body_style, min_font_size))
+        if [b['text'] for b in dict_candidates] != [b['text'] for b in store_candidates]:
+            print("Mismatch between dict and store candidates.")
+            return 1
+
+        print(f"{span_count:>8} {dict_bytes / span_count:>12.0f} {store_bytes / span_count:>13.0f} "
+              f"{dict_time * 1000:>15.1f} {store_time * 1000:>16.1f}")
+    return 0
+
+def _build_store(blocks):
+    store = BlockStore(is_bold=is_bold)
+    store.extend(blocks)
+    store.text(0)  # Joins the text buffer.
+    return store
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,81 @@
+"""
+Microbenchmark for the drawing-rectangle index used by pdf_parser.parse_page.
+
+Compares the brute-force "test every rectangle" containment check with
+spatial_index.RectIndex on synthetic pages with many vector rectangles, and
+verifies that both produce the same is_in_box flags.
+
+    python benchmarks/bench_spatial_index.py --rects 100 1000 5000 --spans 2000
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # PyMuPDF
+from spatial_index import RectIndex
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+
+def random_rect(rng, max_size):
+    x0 = rng.uniform(0, PAGE_WIDTH)
+    y0 = rng.uniform(0, PAGE_HEIGHT)
+    return fitz.Rect(x0, y0, x0 + rng.uniform(1, max_size), y0 + rng.uniform(1, max_size))
+
+def make_page(rng, rect_count, span_count):
+    # Mostly small cells (forms, CAD strokes) plus a few large frames.
+    rects = [random_rect(rng, 40) for _ in range(rect_count)]
+    rects += [random_rect(rng, 400) for _ in range(max(1, rect_count // 100))]
+    spans = [random_rect(rng, 60) for _ in range(span_count)]
+    return rects, spans
+
+def brute_force_flags(rects, spans):
+    flags = []
+    for span_rect in spans:
+        is_in_box = False
+        for rect in rects:
+            if rect.contains(span_rect):
+                is_in_box = True
+                break
+        flags.append(is_in_box)
+    return flags
+
+def indexed_flags(rects, spans):
+    index = RectIndex(rects)
+    return [index.any_contains(span_rect) for span_rect in spans]
+
+def time_call(func, *args, repeat=3):
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rects', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    parser.add_argument('--spans', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    print(f"{'rects':>8} {'spans':>8} {'brute (ms)':>12} {'index (ms)':>12} {'speedup':>8}")
+    for rect_count in args.rects:
+        rects, spans = make_page(rng, rect_count, args.spans)
+        brute_time, brute = time_call(brute_force_flags, rects, spans)
+        index_time, indexed = time_call(indexed_flags, rects, spans)
+        if brute != indexed:
+            print(f"Mismatch between brute-force and indexed flags with {rect_count} rects.")
+            return 1
+        print(f"{len(rects):>8} {len(spans):>8} {brute_time * 1000:>12.2f} {index_time * 1000:>12.2f} "
+              f"{brute_time / index_time if index_time else float('inf'):>7.1f}x")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
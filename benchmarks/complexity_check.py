@@ -0,0 +1,144 @@
+"""
+Scaling check for the title, heading and hierarchy passes. Times each pass on
+synthetic inputs of growing size and fails with exit status 1 if the time grows
+clearly faster than linearly, so quadratic loops cannot come back unnoticed.
+
+The title input is the worst case of the old forward merge scan: a first page
+packed with overlapping large-font lines (posters, slide decks), where every
+start line used to rescan all the lines after it.
+
+    python benchmarks/complexity_check.py
+    python benchmarks/complexity_check.py --spans 1000 10000 100000 --max-exponent 1.4
+"""
+import os
+import sys
+import math
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from title_detector import find_title_blocks, remove_title_blocks
+from heading_detector import detect_headings
+from hierarchy_fixer import refine_heading_hierarchy
+
+FONTS = ['Helvetica', 'Helvetica-Bold', 'Times-Roman', 'Times-Bold']
+WORDS = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit']
+
+# Linear is 1.0 and n log n slightly above; a quadratic pass is close to 2.0.
+DEFAULT_MAX_EXPONENT = 1.5
+# Timings are floored here so that timer noise on the small sizes cannot fail the check.
+MIN_SECONDS = 0.002
+
+def make_title_page(span_count):
+    """A first page of overlapping, off-centre large lines; each style is used three times."""
+    blocks = []
+    step = 480.0 / span_count
+    for i in range(span_count):
+        y0 = i * step
+        blocks.append({
+            'bbox': (20.0, y0, 120.0, y0 + 50.0),
+            'text': 'Poster line',
+            'font_size': 24,
+            'font_name': f'Font-{i // 3}',
+            'page': 0,
+            'is_column_like': False,
+            'is_in_box': False,
+        })
+    blocks.append({'bbox': (0.0, 780.0, 600.0, 790.0), 'text': 'Footer text', 'font_size': 8,
+                   'font_name': 'Times-Roman', 'page': 0, 'is_column_like': False, 'is_in_box': False})
+    return blocks
+
+def make_document(span_count, seed=0):
+    """Slide-deck-like blocks: many pages, a high share of large and bold lines."""
+    rng = random.Random(seed)
+    blocks = []
+    for i in range(span_count):
+        y0 = rng.uniform(0, 780)
+        x0 = rng.uniform(0, 500)
+        size = rng.choice([10] * 6 + [12, 14, 18, 24])
+        text = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 8)))
+        blocks.append({
+            'bbox': (x0, y0, x0 + 5.0 * len(text), y0 + size),
+            'text': text.capitalize(),
+            'font_size': size,
+            'font_name': rng.choice(FONTS),
+            'page': i // 50,
+            'is_column_like': rng.random() < 0.1,
+            'is_in_box': rng.random() < 0.05,
+        })
+    return blocks
+
+def make_headings(count, seed=0):
+    rng = random.Random(seed)
+    return [{'level': f"H{rng.randint(1, 3)}", 'text': 'Heading', 'page': i // 20,
+             '_style': (rng.choice([12, 14, 18, 24]), 'Helvetica-Bold')} for i in range(count)]
+
+def run_title(span_count):
+    blocks = make_title_page(span_count)
+    return lambda: find_title_blocks(blocks, 8)
+
+def run_headings(span_count):
+    blocks = make_document(span_count)
+    body_style = {'size': 10, 'font': 'Times-Roman'}
+
+    def run():
+        title_blocks = find_title_blocks(blocks, 8)
+        return detect_headings(remove_title_blocks(blocks, title_blocks), body_style, 8)
+    return run
+
+def run_hierarchy(span_count):
+    headings = make_headings(span_count)
+    # The fixer rewrites levels in place, so every run gets fresh copies.
+    return lambda: refine_heading_hierarchy([dict(h) for h in headings])
+
+PASSES = {
+    'find_title_blocks': run_title,
+    'detect_headings': run_headings,
+    'refine_heading_hierarchy': run_hierarchy,
+}
+
+def best_time(func, repeat=3):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def growth_exponent(small_n, small_t, large_n, large_t):
+    """Returns k such that the time grows like n ** k between the two sizes."""
+    small_t, large_t = max(small_t, MIN_SECONDS), max(large_t, MIN_SECONDS)
+    return math.log(large_t / small_t) / math.log(large_n / small_n)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--spans', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--max-exponent', type=float, default=DEFAULT_MAX_EXPONENT,
+                        help="Largest allowed growth exponent between consecutive sizes.")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args(argv)
+    sizes = sorted(args.spans)
+
+    failures = []
+    print(f"{'pass':<26}" + ''.join(f"{n:>12}" for n in sizes) + f"{'exponent':>10}")
+    for name, make_run in PASSES.items():
+        timings = [best_time(make_run(n), args.repeat) for n in sizes]
+        exponents = [growth_exponent(sizes[i], timings[i], sizes[i + 1], timings[i + 1])
+                     for i in range(len(sizes) - 1)]
+        worst = max(exponents, default=0.0)
+        print(f"{name:<26}" + ''.join(f"{t * 1000:>10.1f}ms" for t in timings) + f"{worst:>10.2f}")
+        if worst > args.max_exponent:
+            failures.append(f"{name}: time grows like n^{worst:.2f} (limit n^{args.max_exponent:g})")
+
+    if failures:
+        print(f"\n{len(failures)} pass(es) scale worse than linear:")
+        for failure in failures:
+            print(f"  {failure}")
+        return 1
+    print(f"\nAll passes scale within n^{args.max_exponent:g}.")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
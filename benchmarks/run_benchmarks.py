@@ -0,0 +1,302 @@
+"""
+Benchmark harness for the outlining pipeline on a synthetic corpus.
+
+Generates the PDFs offline (see synthetic_corpus.py), times every pipeline stage
+on each of them, and reports pages/sec and peak resident memory (MuPDF's native
+allocations included). Results can be saved as a baseline JSON; later runs
+compared against it fail with exit status 1 when any stage is slower, or the peak
+memory higher, than the baseline by more than the threshold.
+
+Scenarios whose PDFs carry embedded bookmarks are also timed on the bookmark
+fast path, reported as "<scenario>/bookmarks". On every scenario the sampled
+body-style estimate (--sample-styles) is checked against the full style scan,
+and the agreement is reported. Only documents with text smaller than the body
+(the "footnoted" scenario) get an estimate; the others fall back to the scan.
+Scenarios with running labels also check --drop-repeated: the running header and
+the "Page N of M" footers must be dropped and every numbered section heading kept,
+or the run exits with status 1.
+
+    python benchmarks/run_benchmarks.py --save-baseline benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --baseline benchmarks/baseline.json --threshold 0.25
+"""
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import contextlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from pdf_parser import StyleStats, get_text_blocks, scan_style_stats, estimate_style_stats, first_page_height
+from title_detector import find_title_blocks, remove_title_blocks
+from heading_detector import detect_headings
+from hierarchy_fixer import refine_heading_hierarchy
+from bookmark_outline import detect_from_bookmarks
+from repeat_index import RepeatIndex
+from instrumentation import reset_peak_rss, peak_rss_bytes
+from main import extract_outline
+from synthetic_corpus import generate_pdf, corpus_name, RUNNING_HEADER, SECTION_PREFIX
+
+STAGES = ('get_text_blocks', 'find_title_blocks', 'detect_headings', 'refine_heading_hierarchy')
+
+# Stage timings below this many seconds are too noisy to flag as regressions.
+MIN_REGRESSION_SECONDS = 0.005
+
+# Peak memory growth below this many MB is too noisy to flag as a regression.
+MIN_REGRESSION_MB = 5.0
+
+SCENARIOS = {
+    'plain': dict(pages=20, spans_per_page=40, columns=1, boxes_per_page=0, heading_density=0.1),
+    'long': dict(pages=300, spans_per_page=40, columns=1, boxes_per_page=0, heading_density=0.05),
+    'two_column': dict(pages=50, spans_per_page=80, columns=2, boxes_per_page=0, heading_density=0.1),
+    'boxes': dict(pages=20, spans_per_page=40, columns=1, boxes_per_page=500, heading_density=0.1),
+    'heading_dense': dict(pages=20, spans_per_page=60, columns=1, boxes_per_page=0, heading_density=0.5),
+    'bookmarked': dict(pages=300, spans_per_page=40, columns=1, boxes_per_page=0, heading_density=0.05,
+                       bookmarks=True),
+    # Body text above the document's smallest size, so the sampled style estimate is accepted.
+    'footnoted': dict(pages=300, spans_per_page=40, columns=1, boxes_per_page=0, heading_density=0.05,
+                      footnotes_per_page=2),
+    # Running header, "Page N of M" footer and a numbered section heading at the same spot on every page.
+    'running_labels': dict(pages=40, spans_per_page=40, columns=1, boxes_per_page=0, heading_density=0.05,
+                           running_labels=True),
+}
+
+def run_pipeline(pdf_path):
+    """Runs the pipeline stages like main.process_pdf does; returns {stage: seconds}."""
+    timings = {}
+
+    start = time.perf_counter()
+    stats = StyleStats()
+    all_blocks, body_style, min_font_size = get_text_blocks(pdf_path, stats=stats)
+    timings['get_text_blocks'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    title_blocks = find_title_blocks(all_blocks, min_font_size, stats.styles)
+    timings['find_title_blocks'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    headings = detect_headings(remove_title_blocks(all_blocks, title_blocks), body_style, min_font_size,
+                               styles=stats.styles)
+    timings['detect_headings'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    refine_heading_hierarchy(headings)
+    timings['refine_heading_hierarchy'] = time.perf_counter() - start
+
+    return timings
+
+def run_bookmark_pipeline(pdf_path):
+    """Runs the bookmark fast path like main.process_pdf(use_bookmarks=True); returns {stage: seconds}."""
+    timings = {}
+
+    start = time.perf_counter()
+    from_bookmarks = detect_from_bookmarks(pdf_path)
+    timings['detect_from_bookmarks'] = time.perf_counter() - start
+    if from_bookmarks is None:
+        raise ValueError(f"{pdf_path} has no usable bookmarks")
+
+    start = time.perf_counter()
+    refine_heading_hierarchy(from_bookmarks[1])
+    timings['refine_heading_hierarchy'] = time.perf_counter() - start
+
+    return timings
+
+def _peak_rss_of_run(pipeline, pdf_path):
+    reset = reset_peak_rss()
+    pipeline(pdf_path)
+    return peak_rss_bytes(since_reset=reset)
+
+def measure_peak_rss(pdf_path, pipeline=run_pipeline):
+    """
+    Returns the peak resident memory of one pipeline run in bytes, or None where
+    it is unknown. The run happens in a fresh process, so the figure covers
+    MuPDF's native heap and nothing left over from earlier scenarios.
+    """
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as executor:
+        return executor.submit(_peak_rss_of_run, pipeline, pdf_path).result()
+
+def benchmark_scenario(pdf_path, pages, repeat, pipeline=run_pipeline):
+    """Returns the best-of-repeat stage timings, pages/sec and peak resident memory of one PDF."""
+    best = None
+    for _ in range(repeat):
+        timings = pipeline(pdf_path)
+        if best is None or sum(timings.values()) < sum(best.values()):
+            best = timings
+
+    peak = measure_peak_rss(pdf_path, pipeline)
+    total = sum(best.values())
+    return {
+        'pages': pages,
+        'stages': best,
+        'total': total,
+        'pages_per_sec': pages / total if total else float('inf'),
+        'peak_rss_mb': peak / (1024 * 1024) if peak is not None else None,
+    }
+
+def style_sample_agreement(pdf_path):
+    """
+    Compares the sampled style estimate with the full scan of one PDF.
+
+    Returns:
+        dict: Whether an estimate was made (an ambiguous sample or a short document
+              falls back to the full scan), whether it matches the full scan's body
+              style and minimum font size, and the time of both.
+    """
+    start = time.perf_counter()
+    full = scan_style_stats(pdf_path)
+    scan_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    estimate = estimate_style_stats(pdf_path)
+    sample_seconds = time.perf_counter() - start
+
+    agrees = None
+    if estimate is not None:
+        agrees = (estimate.body_style(), estimate.min_font_size) == (full.body_style(), full.min_font_size)
+    return {'estimated': estimate is not None, 'agrees': agrees,
+            'scan_seconds': scan_seconds, 'sample_seconds': sample_seconds}
+
+def repeated_label_check(pdf_path, pages):
+    """
+    Checks --drop-repeated on a PDF with running labels: the running header and
+    the page footers must be found repeated, and every numbered section heading
+    must survive into the outline.
+
+    Returns:
+        dict: The labels found repeated, the section headings kept, and the
+              numbers expected of both.
+    """
+    index = RepeatIndex(page_height=first_page_height(pdf_path))
+    blocks, _, _ = get_text_blocks(pdf_path, repeat_index=index)
+    labels = [b for b in blocks if b['text'] == RUNNING_HEADER or b['text'].startswith('Page ')]
+    with contextlib.redirect_stdout(io.StringIO()):
+        outline = extract_outline(pdf_path, drop_repeated=True)['outline']
+    return {'labels_dropped': sum(1 for b in labels if index.is_repeated(b)), 'labels': 2 * pages,
+            # detect_headings joins consecutive headings of one style, so occurrences are counted.
+            'sections_kept': sum(h['text'].count(SECTION_PREFIX) for h in outline), 'sections': pages}
+
+def print_label_checks(checks):
+    """Prints the repeated-label checks; returns True if all of them passed."""
+    passed = True
+    for name, check in checks.items():
+        ok = check['labels_dropped'] == check['labels'] and check['sections_kept'] == check['sections']
+        passed = passed and ok
+        print(f"{name}: --drop-repeated dropped {check['labels_dropped']}/{check['labels']} running labels "
+              f"and kept {check['sections_kept']}/{check['sections']} numbered section headings "
+              f"({'ok' if ok else 'FAILED'})")
+    return passed
+
+def print_style_samples(samples):
+    print(f"\n{'scenario':<22}{'estimate':>10}{'full scan':>12}{'sample':>12}")
+    for name, sample in samples.items():
+        if not sample['estimated']:
+            verdict = 'fallback'
+        else:
+            verdict = 'agrees' if sample['agrees'] else 'DIFFERS'
+        print(f"{name:<22}{verdict:>10}{sample['scan_seconds'] * 1000:>10.1f}ms{sample['sample_seconds'] * 1000:>10.1f}ms")
+    estimated = [s for s in samples.values() if s['estimated']]
+    if estimated:
+        agreeing = sum(1 for s in estimated if s['agrees'])
+        print(f"Sampled estimate agrees with the full scan on {agreeing} of {len(estimated)} estimated scenarios "
+              f"(mismatches are re-run with the exact statistics, so outputs never differ).")
+
+def compare(results, baseline, threshold):
+    """Returns a list of human-readable regressions of results against baseline."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        checks = [(stage, seconds, base['stages'].get(stage)) for stage, seconds in result['stages'].items()]
+        checks.append(('total', result['total'], base.get('total')))
+        for stage, current, previous in checks:
+            if previous is None or current < MIN_REGRESSION_SECONDS:
+                continue
+            if current > previous * (1 + threshold):
+                regressions.append(f"{name}/{stage}: {current:.4f}s vs baseline {previous:.4f}s "
+                                   f"(+{(current / previous - 1) * 100:.0f}%)")
+        current, previous = result.get('peak_rss_mb'), base.get('peak_rss_mb')
+        if (current is not None and previous and current - previous >= MIN_REGRESSION_MB and
+                current > previous * (1 + threshold)):
+            regressions.append(f"{name}/peak_rss: {current:.1f} MB vs baseline {previous:.1f} MB "
+                               f"(+{(current / previous - 1) * 100:.0f}%)")
+    return regressions
+
+def print_results(results):
+    header = (f"{'scenario':<22}" + ''.join(f"{stage:>26}" for stage in STAGES) +
+              f"{'total':>12}{'pages/s':>10}{'RSS MB':>9}")
+    print(header)
+    for name, result in results.items():
+        stages = result['stages']
+        row = f"{name:<22}" + ''.join(f"{stages[stage] * 1000:>24.1f}ms" if stage in stages else f"{'-':>26}"
+                                      for stage in STAGES)
+        peak = f"{result['peak_rss_mb']:>9.1f}" if result['peak_rss_mb'] is not None else f"{'-':>9}"
+        print(row + f"{result['total'] * 1000:>10.1f}ms" + f"{result['pages_per_sec']:>10.1f}" + peak)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', nargs='+', choices=sorted(SCENARIOS), default=sorted(SCENARIOS),
+                        help="Scenarios to run (default: all).")
+    parser.add_argument('--scale', type=float, default=1.0, help="Multiply every scenario's page count.")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per scenario; the fastest is kept.")
+    parser.add_argument('--corpus-dir', help="Where generated PDFs are kept (default: a temporary directory).")
+    parser.add_argument('--baseline', help="Baseline JSON to compare against.")
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help="Allowed slowdown against the baseline, as a fraction (default: 0.2).")
+    parser.add_argument('--save-baseline', help="Write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        corpus_dir = args.corpus_dir or tmp_dir
+        os.makedirs(corpus_dir, exist_ok=True)
+
+        results = {}
+        style_samples = {}
+        label_checks = {}
+        for name in args.scenario:
+            params = dict(SCENARIOS[name])
+            params['pages'] = max(1, int(params['pages'] * args.scale))
+            pdf_path = os.path.join(corpus_dir, corpus_name(**params) + '.pdf')
+            if not os.path.exists(pdf_path):
+                generate_pdf(pdf_path, **params)
+            results[name] = benchmark_scenario(pdf_path, params['pages'], args.repeat)
+            style_samples[name] = style_sample_agreement(pdf_path)
+            if params.get('running_labels'):
+                label_checks[name] = repeated_label_check(pdf_path, params['pages'])
+            if params.get('bookmarks'):
+                results[f"{name}/bookmarks"] = benchmark_scenario(pdf_path, params['pages'], args.repeat,
+                                                                  run_bookmark_pipeline)
+
+    print_results(results)
+    print_style_samples(style_samples)
+    labels_ok = True
+    if label_checks:
+        print()
+        labels_ok = print_label_checks(label_checks)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=4)
+        print(f"\nBaseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) over {args.threshold * 100:.0f}%:")
+            for regression in regressions:
+                print(f"  {regression}")
+            return 1
+        print(f"\nNo regressions over {args.threshold * 100:.0f}% against {args.baseline}.")
+    return 0 if labels_ok else 1
+
+if __name__ == '__main__':
+    sys.exit(main())
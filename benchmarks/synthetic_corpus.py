@@ -0,0 +1,207 @@
+"""
+Offline generator of synthetic PDFs for the benchmarks, built with PyMuPDF.
+
+Every knob that drives the cost of the pipeline can be set: page count, spans
+per page, column layout, drawn boxes and heading density, footnotes set smaller
+than the body text, running labels (a header, a "Page N of M" footer and a
+numbered section heading at the same spot on every page), and whether the
+headings are also written as embedded bookmarks. The same arguments and seed
+always produce the same document.
+
+    python benchmarks/synthetic_corpus.py out.pdf --pages 200 --columns 2 --boxes 20
+"""
+import os
+import sys
+import random
+import argparse
+
+import fitz  # PyMuPDF
+
+PAGE_WIDTH = 612
+PAGE_HEIGHT = 792
+MARGIN = 54
+BODY_SIZE = 10
+HEADING_SIZES = (18, 14, 12)
+FOOTNOTE_SIZE = 8
+RUNNING_HEADER = 'Synthetic corpus running header'
+SECTION_PREFIX = 'Section '
+LINE_SPACING = 1.6
+
+WORDS = ('lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor '
+         'incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud '
+         'exercitation ullamco laboris nisi aliquip ex ea commodo consequat').split()
+
+def random_text(rng, min_words, max_words):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(min_words, max_words))]
+    words[0] = words[0].capitalize()
+    return ' '.join(words)
+
+def _add_title(page, rng):
+    title = random_text(rng, 3, 6)
+    size = 24
+    width = fitz.get_text_length(title, fontname='hebo', fontsize=size)
+    page.insert_text(((PAGE_WIDTH - width) / 2, MARGIN + size), title, fontsize=size, fontname='hebo')
+    return MARGIN + size * 3
+
+def _add_lines(page, rng, spans, columns, heading_density, start_y, headings=None):
+    """
+    Writes the page's spans column by column; returns the bboxes of the lines written.
+    The (level, text) of every heading written is appended to headings, if given.
+    """
+    column_width = (PAGE_WIDTH - 2 * MARGIN) / columns
+    spans_per_column = max(1, -(-spans // columns))
+    line_rects = []
+    for column in range(columns):
+        x = MARGIN + column * column_width
+        y = start_y
+        for _ in range(spans_per_column):
+            if rng.random() < heading_density:
+                size = rng.choice(HEADING_SIZES)
+                font = 'hebo'
+                text = random_text(rng, 2, 6)
+            else:
+                size = BODY_SIZE
+                font = 'helv'
+                text = random_text(rng, 4, 10)
+            # Keep the line inside its column.
+            while len(text) > 8 and fitz.get_text_length(text, fontname=font, fontsize=size) > column_width - 6:
+                text = text.rsplit(' ', 1)[0]
+
+            y += size * LINE_SPACING
+            if y > PAGE_HEIGHT - MARGIN:
+                break
+            page.insert_text((x, y), text, fontsize=size, fontname=font)
+            if headings is not None and size != BODY_SIZE:
+                headings.append((HEADING_SIZES.index(size) + 1, text))
+            text_width = fitz.get_text_length(text, fontname=font, fontsize=size)
+            line_rects.append(fitz.Rect(x, y - size, x + text_width, y + size * 0.3))
+    return line_rects
+
+def _add_footnotes(page, rng, footnotes):
+    """Writes numbered footnote lines in the bottom margin, as many as fit."""
+    y = PAGE_HEIGHT - MARGIN
+    for number in range(1, footnotes + 1):
+        y += FOOTNOTE_SIZE * LINE_SPACING
+        if y > PAGE_HEIGHT - FOOTNOTE_SIZE:
+            break
+        page.insert_text((MARGIN, y), f"{number} {random_text(rng, 6, 12)}", fontsize=FOOTNOTE_SIZE, fontname='helv')
+
+def _add_running_labels(page, page_num, pages, start_y):
+    """
+    Writes a running header and a centred "Page N of M" footer in the margins, and
+    a numbered section heading that only differs in its number on every page.
+    Returns the y the page's lines start below.
+    """
+    page.insert_text((MARGIN, MARGIN / 2), RUNNING_HEADER, fontsize=FOOTNOTE_SIZE, fontname='helv')
+    label = f"Page {page_num + 1} of {pages}"
+    width = fitz.get_text_length(label, fontname='helv', fontsize=FOOTNOTE_SIZE)
+    page.insert_text(((PAGE_WIDTH - width) / 2, PAGE_HEIGHT - MARGIN / 4), label,
+                     fontsize=FOOTNOTE_SIZE, fontname='helv')
+    # Centred, like the title: left-aligned lines count as a column and are never headings.
+    heading = f"{SECTION_PREFIX}{page_num + 1}.1 Overview"
+    size = HEADING_SIZES[1]
+    y = start_y + size * LINE_SPACING
+    width = fitz.get_text_length(heading, fontname='hebo', fontsize=size)
+    page.insert_text(((PAGE_WIDTH - width) / 2, y), heading, fontsize=size, fontname='hebo')
+    return y
+
+def _add_boxes(page, rng, line_rects, boxes):
+    """Draws non-filled rectangles, half of them around existing lines and half as loose strokes."""
+    for i in range(boxes):
+        if line_rects and i % 2 == 0:
+            rect = rng.choice(line_rects)
+            rect = fitz.Rect(rect.x0 - 3, rect.y0 - 3, rect.x1 + 3, rect.y1 + 3)
+        else:
+            x0 = rng.uniform(0, PAGE_WIDTH - 20)
+            y0 = rng.uniform(0, PAGE_HEIGHT - 20)
+            rect = fitz.Rect(x0, y0, x0 + rng.uniform(5, 120), y0 + rng.uniform(5, 60))
+        page.draw_rect(rect, color=(0, 0, 0), width=0.5)
+
+def _toc_entries(page_headings):
+    """
+    Turns (page number, level, text) headings into set_toc entries. Levels are
+    clamped so that the outline starts at level 1 and never skips a level.
+    """
+    toc = []
+    previous_level = 0
+    for page_num, level, text in page_headings:
+        level = min(level, previous_level + 1)
+        toc.append([level, text, page_num + 1])
+        previous_level = level
+    return toc
+
+def generate_pdf(path, pages=10, spans_per_page=40, columns=1, boxes_per_page=0,
+                 heading_density=0.1, seed=0, bookmarks=False, footnotes_per_page=0, running_labels=False):
+    """
+    Writes a synthetic PDF to path.
+
+    Args:
+        path (str): Output file path.
+        pages (int): Number of pages.
+        spans_per_page (int): Text lines per page (fewer if they do not fit).
+        columns (int): Number of text columns per page.
+        boxes_per_page (int): Non-filled rectangles drawn per page.
+        heading_density (float): Fraction of lines set as bold, larger headings.
+        seed (int): Random seed; the same arguments always give the same PDF.
+        bookmarks (bool): Also write the headings as the PDF's embedded outline.
+        footnotes_per_page (int): Footnote lines in each page's bottom margin, set
+                                  smaller than the body text (fewer if they do not fit).
+        running_labels (bool): Add a running header, a "Page N of M" footer and a
+                               numbered section heading to every page.
+
+    Returns:
+        str: The path of the written PDF.
+    """
+    rng = random.Random(seed)
+    doc = fitz.open()
+    page_headings = []
+    for page_num in range(pages):
+        page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        start_y = _add_title(page, rng) if page_num == 0 else MARGIN
+        if running_labels:
+            start_y = _add_running_labels(page, page_num, pages, start_y)
+        headings = []
+        line_rects = _add_lines(page, rng, spans_per_page, columns, heading_density, start_y, headings)
+        _add_footnotes(page, rng, footnotes_per_page)
+        _add_boxes(page, rng, line_rects, boxes_per_page)
+        page_headings.extend((page_num, level, text) for level, text in headings)
+    if bookmarks:
+        doc.set_toc(_toc_entries(page_headings))
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+    return path
+
+def corpus_name(pages, spans_per_page, columns, boxes_per_page, heading_density, seed=0, bookmarks=False,
+                footnotes_per_page=0, running_labels=False):
+    """Returns a stable file/scenario name for a set of generator arguments."""
+    name = f"p{pages}_s{spans_per_page}_c{columns}_b{boxes_per_page}_h{heading_density:g}_r{seed}"
+    if footnotes_per_page:
+        name += f"_f{footnotes_per_page}"
+    if running_labels:
+        name += "_labels"
+    return name + '_toc' if bookmarks else name
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('output', help="Path of the PDF to write.")
+    parser.add_argument('--pages', type=int, default=10)
+    parser.add_argument('--spans-per-page', type=int, default=40)
+    parser.add_argument('--columns', type=int, default=1)
+    parser.add_argument('--boxes', type=int, default=0)
+    parser.add_argument('--heading-density', type=float, default=0.1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--bookmarks', action='store_true', help="Write the headings as embedded bookmarks.")
+    parser.add_argument('--footnotes', type=int, default=0,
+                        help="Footnote lines per page, set smaller than the body text.")
+    parser.add_argument('--running-labels', action='store_true',
+                        help="Add a running header, a page footer and a numbered section heading to every page.")
+    args = parser.parse_args(argv)
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    generate_pdf(args.output, args.pages, args.spans_per_page, args.columns, args.boxes,
+                 args.heading_density, args.seed, args.bookmarks, args.footnotes, args.running_labels)
+    print(f"Wrote {args.output}")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,231 @@
+from array import array
+from bisect import bisect_left, bisect_right
+
+# Bits of BlockStore.flags
+FLAG_COLUMN = 1
+FLAG_BOX = 2
+FLAG_BOLD = 4   # The font name suggests a bold face (see style_registry.is_bold).
+
+MAX_SIZE_CODE = 255
+
+# --- Masks ---
+# A mask is a bytes object with one 0/1 byte per block. The operations below run
+# in C: translate() for per-byte lookups, and big-integer arithmetic for and/or/not.
+
+def _to_int(mask):
+    return int.from_bytes(mask, 'little')
+
+def _to_mask(value, length):
+    return value.to_bytes(length, 'little')
+
+def mask_and(*masks):
+    value = _to_int(masks[0])
+    for mask in masks[1:]:
+        value &= _to_int(mask)
+    return _to_mask(value, len(masks[0]))
+
+def mask_or(*masks):
+    value = _to_int(masks[0])
+    for mask in masks[1:]:
+        value |= _to_int(mask)
+    return _to_mask(value, len(masks[0]))
+
+def mask_not(mask):
+    return _to_mask(_to_int(mask) ^ _to_int(b'\x01' * len(mask)), len(mask))
+
+def mask_indices(mask):
+    """Returns the positions of the set bytes of a mask."""
+    indices = []
+    i = mask.find(1)
+    while i != -1:
+        indices.append(i)
+        i = mask.find(1, i + 1)
+    return indices
+
+def _flag_table(bits):
+    return bytes(1 if value & bits else 0 for value in range(256))
+
+class BlockStore:
+    """
+    Compact struct-of-arrays storage for text blocks: typed arrays for geometry,
+    sizes, pages, font IDs and style IDs (see style_registry; -1 for blocks
+    without one), a byte per block for the column/box/bold flags, and one text
+    buffer with offsets. It replaces a list of per-span dicts on large
+    documents, and lets the detectors filter candidates with masks over whole
+    columns before any block dict is built.
+
+    block(i) materialises a single block as the usual dict (with an extra '_index'
+    key), so code that works on dicts keeps working on the candidates.
+
+    Args:
+        is_bold (callable, optional): Font-name test used to set FLAG_BOLD, called
+                                      once per distinct font.
+    """
+
+    def __init__(self, is_bold=None):
+        self.x0 = array('d')
+        self.y0 = array('d')
+        self.x1 = array('d')
+        self.y1 = array('d')
+        self.font_size = array('i')
+        self.size_codes = bytearray()   # font_size clamped to 0..255, for masks.
+        self.page = array('i')
+        self.font_id = array('i')
+        self.style_id = array('i')
+        self.flags = bytearray()
+        self.removed = bytearray()
+        self.fonts = []
+        self._font_ids = {}
+        self._font_bold = []
+        self._is_bold = is_bold
+        self._text_parts = []
+        self._text = ''
+        self._text_offsets = array('q', [0])
+
+    def __len__(self):
+        return len(self.page)
+
+    def intern_font(self, font_name):
+        """Returns the integer ID of a font name, registering it on first use."""
+        font_id = self._font_ids.get(font_name)
+        if font_id is None:
+            font_id = len(self.fonts)
+            self._font_ids[font_name] = font_id
+            self.fonts.append(font_name)
+            self._font_bold.append(bool(self._is_bold and self._is_bold(font_name)))
+        return font_id
+
+    def append(self, block):
+        """Appends one block dict as produced by pdf_parser.parse_page."""
+        x0, y0, x1, y1 = block['bbox']
+        self.x0.append(x0)
+        self.y0.append(y0)
+        self.x1.append(x1)
+        self.y1.append(y1)
+        size = block['font_size']
+        self.font_size.append(size)
+        self.size_codes.append(min(max(size, 0), MAX_SIZE_CODE))
+        self.page.append(block['page'])
+        font_id = self.intern_font(block['font_name'])
+        self.font_id.append(font_id)
+        self.style_id.append(block.get('style_id', -1))
+        self.flags.append((FLAG_COLUMN if block['is_column_like'] else 0) |
+                          (FLAG_BOX if block['is_in_box'] else 0) |
+                          (FLAG_BOLD if self._font_bold[font_id] else 0))
+        self.removed.append(0)
+        self._text_parts.append(block['text'])
+        self._text_offsets.append(self._text_offsets[-1] + len(block['text']))
+
+    def extend(self, blocks):
+        for block in blocks:
+            self.append(block)
+
+    def _buffer(self):
+        # Appended texts are joined into the single buffer on first read.
+        if self._text_parts:
+            self._text += ''.join(self._text_parts)
+            self._text_parts = []
+        return self._text
+
+    def text(self, i):
+        return self._buffer()[self._text_offsets[i]:self._text_offsets[i + 1]]
+
+    def block(self, i):
+        """Materialises block i as a block dict."""
+        block = {
+            'bbox': (self.x0[i], self.y0[i], self.x1[i], self.y1[i]),
+            'text': self.text(i),
+            'font_size': self.font_size[i],
+            'font_name': self.fonts[self.font_id[i]],
+            'page': self.page[i],
+            'is_column_like': bool(self.flags[i] & FLAG_COLUMN),
+            'is_in_box': bool(self.flags[i] & FLAG_BOX),
+            '_index': i,
+        }
+        if self.style_id[i] >= 0:
+            block['style_id'] = self.style_id[i]
+        return block
+
+    def blocks(self, indices):
+        return [self.block(i) for i in indices]
+
+    def without(self, indices):
+        """
+        Returns a view of the store with the given blocks removed. The columns are
+        shared with this store; only the removal mask is copied.
+        """
+        self._buffer()
+        view = object.__new__(BlockStore)
+        view.__dict__.update(self.__dict__)
+        view.removed = bytearray(self.removed)
+        for i in indices:
+            view.removed[i] = 1
+        return view
+
+    def next_index(self, i):
+        """Returns the index of the next block after i that is not removed, or None."""
+        i += 1
+        while i < len(self.removed) and self.removed[i]:
+            i += 1
+        return i if i < len(self.removed) else None
+
+    # --- Masks over the whole store ---
+
+    def live_mask(self):
+        """Mask of the blocks that are not removed."""
+        return mask_not(self.removed)
+
+    def flag_mask(self, bits):
+        """Mask of the blocks with any of the given flag bits set."""
+        return bytes(self.flags.translate(_flag_table(bits)))
+
+    def size_mask(self, above):
+        """Mask of the blocks with a font size strictly above the given size."""
+        if not 0 <= above < MAX_SIZE_CODE:
+            return bytes(1 if size > above else 0 for size in self.font_size)
+        return bytes(self.size_codes.translate(bytes(1 if value > above else 0 for value in range(256))))
+
+    def next_flag_mask(self, bits):
+        """
+        Mask of the blocks whose next block that is not removed has any of the
+        given flag bits set; used for lookahead rules.
+        """
+        next_flags = bytearray(self.flags[1:])
+        next_flags.append(0)
+        # Removed blocks are rare (e.g. the title), so patch around them individually.
+        r = self.removed.find(1)
+        while r != -1:
+            p = r - 1
+            while p >= 0 and self.removed[p]:
+                p -= 1
+            if p >= 0:
+                next_i = self.next_index(p)
+                next_flags[p] = self.flags[next_i] if next_i is not None else 0
+            r = self.removed.find(1, r + 1)
+        return bytes(next_flags.translate(_flag_table(bits)))
+
+    def select(self, min_font_size=None, exclude_flags=0, page=None):
+        """
+        Returns the indices of the blocks matching every given condition, e.g.
+        select(min_font_size=body, exclude_flags=FLAG_COLUMN | FLAG_BOX) for
+        "size > body and not column and not box". Removed blocks never match.
+
+        Args:
+            min_font_size (float, optional): Keep blocks with a font size strictly above this.
+            exclude_flags (int): Drop blocks with any of these flag bits set.
+            page (int, optional): Keep blocks on this page only. Blocks are stored
+                                  in page order, so this is a binary search.
+        """
+        if not len(self):
+            return []
+        masks = [self.live_mask()]
+        if exclude_flags:
+            masks.append(mask_not(self.flag_mask(exclude_flags)))
+        if min_font_size is not None:
+            masks.append(self.size_mask(min_font_size))
+        indices = mask_indices(mask_and(*masks))
+
+        if page is not None:
+            start, end = bisect_left(self.page, page), bisect_right(self.page, page)
+            indices = indices[bisect_left(indices, start):bisect_left(indices, end)]
+        return indices
@@ -0,0 +1,92 @@
+from pdf_parser import open_document, parse_page
+from title_detector import find_title_blocks
+
+MAX_LEVEL = 3                  # Output levels are H1-H3; deeper bookmarks are dropped.
+MIN_ENTRIES = 2
+MIN_VALID_FRACTION = 0.9       # Share of entries that must point at an existing page.
+MIN_ORDERED_FRACTION = 0.9     # Share of entries whose page does not go backwards.
+MIN_COVERAGE = 0.5             # The last bookmark must reach this far into longer documents.
+MIN_PAGES_FOR_COVERAGE = 5
+
+def check_toc(toc, page_count):
+    """
+    Decides whether an embedded outline (doc.get_toc()) is good enough to use
+    instead of heuristic heading detection.
+
+    Args:
+        toc (list): [level, title, page] entries, pages 1-based.
+        page_count (int): Number of pages of the document.
+
+    Returns:
+        tuple: (bool, str) whether the outline passes, and the reason if it does not.
+    """
+    entries = [entry for entry in toc if entry[0] <= MAX_LEVEL]
+    if len(entries) < MIN_ENTRIES:
+        return False, "too few entries"
+    if entries[0][0] != 1:
+        return False, "does not start at level 1"
+
+    # Depth: a child can only be one level below its parent.
+    for previous, entry in zip(entries, entries[1:]):
+        if entry[0] > previous[0] + 1:
+            return False, "skips levels"
+
+    if any(not str(entry[1]).strip() for entry in entries):
+        return False, "empty titles"
+
+    valid = [entry for entry in entries if 1 <= entry[2] <= page_count]
+    if len(valid) < MIN_VALID_FRACTION * len(entries):
+        return False, "page numbers out of range"
+
+    ordered = sum(1 for previous, entry in zip(valid, valid[1:]) if entry[2] >= previous[2])
+    if len(valid) > 1 and ordered < MIN_ORDERED_FRACTION * (len(valid) - 1):
+        return False, "page numbers out of order"
+
+    if page_count >= MIN_PAGES_FOR_COVERAGE and max(entry[2] for entry in valid) < MIN_COVERAGE * page_count:
+        return False, "covers too little of the document"
+
+    return True, ""
+
+def headings_from_toc(toc, page_count):
+    """
+    Maps outline entries to heading dictionaries like detect_headings produces:
+    levels 1-3 become H1-H3 and pages become 0-based. Entries deeper than H3 or
+    without a valid page are dropped.
+    """
+    return [
+        {"level": f"H{level}", "text": str(title).strip(), "page": page - 1}
+        for level, title, page, *_ in toc
+        if level <= MAX_LEVEL and 1 <= page <= page_count
+    ]
+
+def detect_from_bookmarks(pdf_path, stats=None):
+    """
+    Fast path for PDFs with a usable embedded outline: the headings come from the
+    bookmarks, and only the first page is parsed to find the title.
+
+    Args:
+        pdf_path (str or bytes): The file path to the PDF, or the PDF's bytes.
+        stats (StyleStats, optional): Receives the counters of the parsed first page.
+
+    Returns:
+        tuple: (title_blocks, headings), or None when the document has no outline
+               that passes check_toc and the heuristics have to be used instead.
+    """
+    doc = open_document(pdf_path)
+    try:
+        toc = doc.get_toc()
+        is_usable, _ = check_toc(toc, doc.page_count)
+        if not is_usable:
+            return None
+
+        headings = headings_from_toc(toc, doc.page_count)
+
+        # The title rules only look at page 0; its smallest font stands in for the document's.
+        page_blocks, page_styles, page_min_font_size, drawing_rect_count = parse_page(doc[0], 0)
+        if stats is not None:
+            stats.add_page(page_styles, page_min_font_size, page_blocks, drawing_rect_count)
+        title_blocks = find_title_blocks(page_blocks, page_min_font_size,
+                                         stats.styles if stats is not None else None)
+        return title_blocks, headings
+    finally:
+        doc.close()
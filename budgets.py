@@ -0,0 +1,68 @@
+import os
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; the memory budget is then not enforced.
+    resource = None
+
+# Reasons recorded in the failures manifest.
+REASON_TIMEOUT = 'timeout'
+REASON_MEMORY = 'memory'
+REASON_ERROR = 'error'
+REASON_CRASHED = 'crashed'
+
+FAILURES_MANIFEST = 'failures.jsonl'
+
+# Stage reported for a document that was stopped before its first pipeline stage.
+STAGE_START = 'start'
+
+def address_space_bytes():
+    """Returns the current virtual memory size of this process in bytes, or None if unknown."""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            pages = int(f.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return None
+    return pages * os.sysconf('SC_PAGE_SIZE')
+
+def limit_memory(max_bytes):
+    """
+    Caps the address space of this process (RLIMIT_AS) at its current size plus
+    max_bytes, so the budget is what the document may allocate on top of the
+    already loaded interpreter and libraries. Allocations beyond it fail with
+    MemoryError in Python code, or with an allocation error inside MuPDF.
+
+    Returns:
+        bool: True if the limit is in place.
+    """
+    if resource is None:
+        return False
+    limit = max_bytes + (address_space_bytes() or 0)
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError):
+        return False  # e.g. macOS, where RLIMIT_AS cannot be lowered like this.
+    return True
+
+# Substrings of allocation failures in error messages ('alloc' covers malloc, calloc and realloc).
+MEMORY_ERROR_MARKERS = ('alloc', 'out of memory', 'memory')
+
+def failure_reason(error, memory_limited):
+    """Classifies an exception raised while processing a document."""
+    if isinstance(error, MemoryError):
+        return REASON_MEMORY
+    message = str(error).lower()
+    # MuPDF reports failed allocations as its own errors, e.g. "code=2: realloc (6144 bytes) failed".
+    if memory_limited and any(marker in message for marker in MEMORY_ERROR_MARKERS):
+        return REASON_MEMORY
+    return REASON_ERROR
+
+def failure_record(document, reason, stage, seconds, detail=None):
+    """Returns the failures manifest entry of a document."""
+    return {
+        'document': document,
+        'reason': reason,
+        'stage': stage,
+        'seconds': round(seconds, 3),
+        'detail': detail,
+    }
@@ -2,64 +2,232 @@ import os
 import re
 import json
 from pdf_parser import get_text_blocks
+from block_store import (BlockStore, FLAG_COLUMN, FLAG_BOX, FLAG_BOLD,
+                         mask_and, mask_or, mask_not, mask_indices)
+from style_registry import is_bold, style_getter
 
-def is_bold(font_name):
-    """Checks if a font name suggests it is bold."""
-    return any(indicator in font_name.lower() for indicator in ['bold', 'black', 'heavy', 'oblique'])
+def with_next(blocks):
+    """Yields (block, next_block) pairs from any iterable; next_block is None for the last block."""
+    iterator = iter(blocks)
+    block = next(iterator, None)
+    if block is None:
+        return
+    for next_block in iterator:
+        yield block, next_block
+        block = next_block
+    yield block, None
 
-def detect_headings(text_blocks, body_style, min_font_size):
+MAX_CANDIDATE_WORDS = 25
+
+def find_candidates(text_blocks, body_style, min_font_size, styles=None):
     """
-    Detects headings using the original logic, ignoring text in columns or boxes, 
-    and prepares them for hierarchy refinement.
+    Returns the blocks that look different enough from body text to be headings.
+    styles is the document's StyleRegistry, if the blocks carry its style IDs.
     """
-    MIN_HEADER_LEN = 7
-    MAX_HEADER_LEN = 87
-
+    styles, style_of = style_getter(styles)
+    body_is_bold = is_bold(body_style.get('font', ''))
     candidates = []
-    for i, block in enumerate(text_blocks):
+    for block, next_block in with_next(text_blocks):
         # Reverted to original flags: 'is_column_like' and 'is_in_box'
         if (block['is_column_like'] or
             block['is_in_box'] or
             block['font_size'] <= min_font_size or
-            len(block['text'].split()) > 25):
+            len(block['text'].split()) > MAX_CANDIDATE_WORDS):
             continue
 
         is_larger = block['font_size'] > body_style.get('size', 12)
-        is_bolder = is_bold(block['font_name']) and not is_bold(body_style.get('font', ''))
-        is_above_column = (i + 1 < len(text_blocks) and 
-                           (text_blocks[i+1]['is_column_like'] or text_blocks[i+1]['is_in_box']) and 
+        is_bolder = styles.bold[style_of(block)] and not body_is_bold
+        is_above_column = (next_block is not None and 
+                           (next_block['is_column_like'] or next_block['is_in_box']) and 
                            not (block['is_column_like'] or block['is_in_box']))
 
         if is_larger or is_bolder or is_above_column:
             candidates.append(block)
+    return candidates
+
+def pages_needing_boxes(pages, body_style, min_font_size, styles=None, repeat_index=None):
+    """
+    Returns the page numbers whose drawn boxes can change the title or the
+    headings, for parsing drawings lazily (see pdf_parser.get_text_blocks).
+
+    A span's is_in_box flag only matters for spans that find_candidates or
+    find_title_blocks could pick, so a page needs its drawings when it has:
+    - on page 0, any title candidate (not column-like, above the minimum size);
+    - an eligible span that is larger or bolder than the body text;
+    - an eligible span whose successor is column-like (its own flag decides);
+    - an eligible span followed by a non-column span: the successor's flag
+      decides, and then the span's own flag, so both pages are needed.
+    Successors are taken after the blocks without_repeated drops, when a
+    repeat_index is given. Title removal can make any page-0 span the
+    predecessor of the first span after page 0, so that span's page is added too.
+
+    Args:
+        pages (list): The per-page block lists, in page order, without boxes.
+        styles (StyleRegistry, optional): The registry of the blocks' style IDs.
+        repeat_index (RepeatIndex, optional): The complete index of the pages, if
+                                              repeated blocks will be dropped.
+    """
+    styles, style_of = style_getter(styles)
+    repeated = repeat_index.repeated() if repeat_index is not None else None
+    needed = set()
+    body_is_bold = is_bold(body_style.get('font', ''))
+    previous = None   # Last eligible, non-distinctive span, waiting for its successor.
+    after_title = False   # Page 0 has title candidates; the next span after page 0 needs its flag.
+    for page_num, page_blocks in enumerate(pages):
+        if page_num == 0 and any(not b['is_column_like'] and b['font_size'] > min_font_size for b in page_blocks):
+            needed.add(0)
+            after_title = True
+        for block in page_blocks:
+            if repeated and repeat_index.block_key(block) in repeated:
+                continue  # Dropped before heading detection: neither a candidate nor a successor.
+            if after_title and page_num > 0:
+                needed.add(page_num)
+                after_title = False
+            if previous is not None:
+                needed.add(previous['page'])
+                if not block['is_column_like']:
+                    needed.add(page_num)
+                previous = None
+
+            if (block['is_column_like'] or
+                block['font_size'] <= min_font_size or
+                len(block['text'].split()) > MAX_CANDIDATE_WORDS):
+                continue
+            is_larger = block['font_size'] > body_style.get('size', 12)
+            is_bolder = styles.bold[style_of(block)] and not body_is_bold
+            if is_larger or is_bolder:
+                needed.add(page_num)
+            else:
+                previous = block
+    return needed
+
+def find_store_candidates(store, body_style, min_font_size):
+    """
+    Same as find_candidates for a BlockStore. The size, flag and lookahead tests
+    are combined as masks over whole columns, and only the surviving candidates
+    are materialised as block dicts.
+    """
+    flagged = FLAG_COLUMN | FLAG_BOX
+    eligible = mask_and(store.live_mask(),
+                        mask_not(store.flag_mask(flagged)),
+                        store.size_mask(min_font_size))
+
+    is_larger = store.size_mask(body_style.get('size', 12))
+    is_above_column = store.next_flag_mask(flagged)
+    if is_bold(body_style.get('font', '')):
+        distinctive = mask_or(is_larger, is_above_column)
+    else:
+        distinctive = mask_or(is_larger, store.flag_mask(FLAG_BOLD), is_above_column)
+
+    # The word count needs the text, so it only runs on the few remaining blocks.
+    return [store.block(i) for i in mask_indices(mask_and(eligible, distinctive))
+            if len(store.text(i).split()) <= MAX_CANDIDATE_WORDS]
+
+def _repeated_counter(body_style, min_font_size, counts):
+    """
+    Returns a function that counts a dropped repeated block in counts: every one
+    under 'repeated_blocks_dropped', and those that pass find_candidates' own tests
+    (ignoring the lookahead) under 'repeated_candidates_dropped'.
+    """
+    body_is_bold = is_bold(body_style.get('font', ''))
+    counts.setdefault('repeated_blocks_dropped', 0)
+    counts.setdefault('repeated_candidates_dropped', 0)
+
+    def count(block):
+        counts['repeated_blocks_dropped'] += 1
+        if (block['is_column_like'] or
+            block['is_in_box'] or
+            block['font_size'] <= min_font_size or
+            len(block['text'].split()) > MAX_CANDIDATE_WORDS):
+            return
+        if block['font_size'] > body_style.get('size', 12) or (is_bold(block['font_name']) and not body_is_bold):
+            counts['repeated_candidates_dropped'] += 1
+    return count
+
+def without_repeated(text_blocks, repeat_index, body_style, min_font_size, counts):
+    """
+    Drops the blocks that repeat_index (a RepeatIndex over the whole document)
+    found on many pages: running headers, footers and page labels. They would
+    otherwise flood the heading candidates. A BlockStore comes back as a view
+    without them; other blocks as a stream.
+
+    Args:
+        counts (dict): Receives the number of dropped blocks
+                       ('repeated_blocks_dropped') and of those that looked like
+                       heading candidates ('repeated_candidates_dropped').
+    """
+    repeated = repeat_index.repeated()
+    count = _repeated_counter(body_style, min_font_size, counts)
+    if isinstance(text_blocks, BlockStore):
+        store = text_blocks
+        indices = []
+        if repeated:
+            for i in mask_indices(store.live_mask()):
+                bbox = (store.x0[i], store.y0[i], store.x1[i], store.y1[i])
+                key = repeat_index.key(store.text(i), bbox, store.font_size[i], store.fonts[store.font_id[i]])
+                if key in repeated:
+                    indices.append(i)
+                    count(store.block(i))
+        return store.without(indices)
+    if not repeated:
+        return text_blocks
+    return _stream_without(text_blocks, repeated, repeat_index.block_key, count)
+
+def _stream_without(text_blocks, repeated, block_key, count):
+    for block in text_blocks:
+        if block_key(block) in repeated:
+            count(block)
+        else:
+            yield block
+
+def detect_headings(text_blocks, body_style, min_font_size, metrics=None, styles=None):
+    """
+    Detects headings using the original logic, ignoring text in columns or boxes, 
+    and prepares them for hierarchy refinement.
+
+    text_blocks may be a list or a stream of blocks (see pdf_parser.iter_text_blocks);
+    it is read once, and only the heading candidates are kept in memory. A
+    BlockStore is filtered column-wise instead. When metrics (see instrumentation)
+    is given, the number of heading candidates is counted on it. styles is the
+    document's StyleRegistry, if the blocks carry its style IDs.
+
+    Heading styles are ranked by font size; styles of the same size rank in the
+    order they first appear, so the levels do not depend on hash order.
+    """
+    MIN_HEADER_LEN = 7
+    MAX_HEADER_LEN = 87
+
+    if isinstance(text_blocks, BlockStore):
+        candidates = find_store_candidates(text_blocks, body_style, min_font_size)
+    else:
+        candidates = find_candidates(text_blocks, body_style, min_font_size, styles)
+
+    if metrics is not None:
+        metrics.count('heading_candidates', len(candidates))
 
     if not candidates:
         return []
 
-    heading_styles = sorted(list(set((h['font_size'], h['font_name']) for h in candidates)), key=lambda x: x[0], reverse=True)
-    style_rank = {style: i for i, style in enumerate(heading_styles)}
+    styles, style_of = style_getter(styles)
+    candidate_styles = [style_of(block) for block in candidates]
+    style_rank = styles.rank(candidate_styles)
 
     classified_headings = []
     last_level = 0
+    last_heading_level = 0
+    last_heading_rank = None
     
     i = 0
     while i < len(candidates):
         block = candidates[i]
-        style = (block['font_size'], block['font_name'])
-        
-        if style not in style_rank:
-            i += 1
-            continue
-
+        style = candidate_styles[i]
         current_rank = style_rank[style]
         
-        if not classified_headings:
+        if last_heading_rank is None:
             level = 1
         else:
-            last_heading_style = classified_headings[-1]['_style']
-            last_rank = style_rank[last_heading_style]
-            if current_rank < last_rank: level = current_rank + 1
-            elif current_rank > last_rank: level = last_level + 1
+            if current_rank < last_heading_rank: level = current_rank + 1
+            elif current_rank > last_heading_rank: level = last_level + 1
             else: level = last_level
         
         level = min(level, 3)
@@ -68,7 +236,7 @@ def detect_headings(text_blocks, body_style, min_font_size):
         text = block['text']
         if i + 1 < len(candidates):
             next_block = candidates[i+1]
-            if (next_block['font_size'], next_block['font_name']) == style:
+            if candidate_styles[i + 1] == style:
                 vertical_gap = next_block['bbox'][1] - block['bbox'][3]
                 if vertical_gap < (block['font_size'] * 1.5):
                     text += " " + next_block['text']
@@ -79,9 +247,12 @@ def detect_headings(text_blocks, body_style, min_font_size):
             cleaned_text[0].isalnum() and 
             MIN_HEADER_LEN <= len(cleaned_text) <= MAX_HEADER_LEN):
             # Keep the _style key for the hierarchy fixer
-            classified_headings.append({"level": f"H{level}", "text": cleaned_text, "page": block['page'], "_style": style})
-        elif classified_headings:
-            last_level = int(classified_headings[-1]['level'].replace('H',''))
+            classified_headings.append({"level": f"H{level}", "text": cleaned_text, "page": block['page'],
+                                        "_style": styles.styles[style]})
+            last_heading_level = level
+            last_heading_rank = current_rank
+        elif last_heading_rank is not None:
+            last_level = last_heading_level
 
         i += 1
             
@@ -32,40 +32,40 @@ def refine_heading_hierarchy(headings):
     if not headings:
         return []
 
-    # Pass 1: Enforce sequential hierarchy.
-    # A heading level cannot jump more than one level down (e.g., H1 to H3).
-    # Also, a document shouldn't start with an H2 or H3.
-    max_level_seen = 0
+    # The three rules below used to be three passes over the list. Each rule only
+    # looks at earlier headings and at the current heading's level as the previous
+    # rule left it, so they run as one pass with a state per rule.
+    max_level_seen = 0        # Rule 1
+    last_h1_size = -1         # Rule 2
+    last_h2_size = -1
+    max_level_rechecked = 0   # Rule 3
+
     for i, heading in enumerate(headings):
+        # Rule 1: Enforce sequential hierarchy.
+        # A heading level cannot jump more than one level down (e.g., H1 to H3).
+        # Also, a document shouldn't start with an H2 or H3.
         current_level = get_level(heading)
-        
+
         if i == 0 and current_level > 1:
             current_level = 1 # The first heading must be H1
 
         if current_level > max_level_seen + 1:
             current_level = max_level_seen + 1
-        
-        heading['level'] = f"H{current_level}"
-        max_level_seen = current_level
 
-    # Pass 2: Correct levels based on font size hierarchy.
-    # An H2 should not have a larger font than the preceding H1, etc.
-    # This pass corrects such logical inconsistencies.
-    last_h1_size = -1
-    last_h2_size = -1
+        max_level_seen = current_level
 
-    for heading in headings:
-        current_level = get_level(heading)
+        # Rule 2: Correct levels based on font size hierarchy.
+        # An H2 should not have a larger font than the preceding H1, etc.
         current_size = get_font_size(heading)
 
         if current_level == 1:
             last_h1_size = current_size
             last_h2_size = -1  # Reset H2 context after an H1
-        
+
         elif current_level == 2:
             # If this H2 is larger than the last H1, it's likely an H1.
             if last_h1_size != -1 and current_size > last_h1_size:
-                heading['level'] = 'H1'
+                current_level = 1
                 last_h1_size = current_size
                 last_h2_size = -1
             else:
@@ -74,28 +74,24 @@ def refine_heading_hierarchy(headings):
         elif current_level == 3:
             # If this H3 is larger than the last H2, promote it to H2.
             if last_h2_size != -1 and current_size > last_h2_size:
-                heading['level'] = 'H2'
+                current_level = 2
                 last_h2_size = current_size
             # If it's also larger than the last H1 (and no H2 seen), promote to H1.
             elif last_h1_size != -1 and current_size > last_h1_size:
-                heading['level'] = 'H1'
+                current_level = 1
                 last_h1_size = current_size
                 last_h2_size = -1
-    
-    # Pass 3: Run the sequential check again, as the font size corrections
-    # might have created new jumps (e.g., promoting a heading).
-    max_level_seen = 0
-    for i, heading in enumerate(headings):
-        current_level = get_level(heading)
-        
+
+        # Rule 3: Run the sequential check again, as the font size corrections
+        # might have created new jumps (e.g., promoting a heading).
         if i == 0 and current_level > 1:
             current_level = 1
 
-        if current_level > max_level_seen + 1:
-            current_level = max_level_seen + 1
-        
+        if current_level > max_level_rechecked + 1:
+            current_level = max_level_rechecked + 1
+
         heading['level'] = f"H{current_level}"
-        max_level_seen = max(max_level_seen, current_level)
+        max_level_rechecked = max(max_level_rechecked, current_level)
 
     return headings
 
@@ -0,0 +1,205 @@
+import os
+import sys
+import json
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows; peak memory is then not reported.
+    resource = None
+
+METRIC_PREFIX = 'pdf_outline'
+
+# Linux only: writing 5 to clear_refs resets the process's peak RSS (VmHWM in status).
+CLEAR_REFS_PATH = '/proc/self/clear_refs'
+STATUS_PATH = '/proc/self/status'
+
+SCOPE_DOCUMENT = 'document'
+SCOPE_PROCESS = 'process'
+
+class _StageTimer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        self.metrics.stages[self.name] = self.metrics.stages.get(self.name, 0.0) + elapsed
+        return False
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_STAGE = _NullStage()
+
+class DocumentMetrics:
+    """
+    Metrics of a single document: wall time per pipeline stage, counters
+    (pages, spans, drawing rects, column-flagged blocks, heading candidates,
+    final headings) and peak memory. On Linux the peak is reset when the document
+    starts, so it is the document's own; elsewhere it is the process's peak since
+    it started, and peak_rss_scope says which one was recorded.
+
+        metrics = DocumentMetrics('report.pdf')
+        with metrics.stage('parse'):
+            ...
+        metrics.count('spans', len(blocks))
+    """
+    enabled = True
+
+    def __init__(self, document):
+        self.document = document
+        self.stages = {}
+        self.counts = {}
+        self.status = 'ok'
+        self.peak_rss_bytes = None
+        self.peak_rss_scope = SCOPE_DOCUMENT if reset_peak_rss() else SCOPE_PROCESS
+        self._start = time.perf_counter()
+        self.wall_time = None
+
+    def stage(self, name):
+        """Returns a context manager that adds its wall time to the named stage."""
+        return _StageTimer(self, name)
+
+    def count(self, name, value=1):
+        self.counts[name] = self.counts.get(name, 0) + value
+
+    def set(self, name, value):
+        self.counts[name] = value
+
+    def finish(self, status='ok'):
+        """Records the total wall time, the final status and the peak memory."""
+        self.wall_time = time.perf_counter() - self._start
+        self.status = status
+        self.peak_rss_bytes = peak_rss_bytes(self.peak_rss_scope == SCOPE_DOCUMENT)
+        return self
+
+    def to_dict(self):
+        return {
+            'document': self.document,
+            'status': self.status,
+            'wall_time': self.wall_time,
+            'stages': self.stages,
+            'counts': self.counts,
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'peak_rss_scope': self.peak_rss_scope,
+        }
+
+class StageReporter(DocumentMetrics):
+    """
+    DocumentMetrics that also sends ('stage', name) through a multiprocessing
+    connection whenever a stage starts, so the parent of a worker it has to kill
+    still knows how far the document got.
+    """
+
+    def __init__(self, document, conn):
+        super().__init__(document)
+        self.conn = conn
+
+    def stage(self, name):
+        self.conn.send(('stage', name))
+        return super().stage(name)
+
+class NullMetrics:
+    """Stand-in used when instrumentation is disabled; every call is a no-op."""
+    enabled = False
+
+    def stage(self, name):
+        return _NULL_STAGE
+
+    def count(self, name, value=1):
+        pass
+
+    def set(self, name, value):
+        pass
+
+    def finish(self, status='ok'):
+        return self
+
+NULL_METRICS = NullMetrics()
+
+def reset_peak_rss():
+    """Resets this process's peak resident set size. Returns False where that is not possible."""
+    try:
+        with open(CLEAR_REFS_PATH, 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+def peak_rss_bytes(since_reset=False):
+    """
+    Returns the peak resident set size of this process in bytes, or None if unknown:
+    since the last reset_peak_rss() if since_reset, otherwise since the process started.
+    """
+    if since_reset:
+        try:
+            with open(STATUS_PATH) as f:
+                for line in f:
+                    if line.startswith('VmHWM:'):
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        return None
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere.
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def write_jsonl(records, path):
+    """Appends one JSON line per document record to path."""
+    with open(path, 'a', encoding='utf-8') as f:
+        for record in records:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_prometheus(records):
+    """Formats document records in the Prometheus text exposition format."""
+    lines = []
+
+    def family(name, help_text, samples):
+        if not samples:
+            return
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+        for labels, value in samples:
+            label_text = ','.join(f'{key}="{_escape_label(val)}"' for key, val in labels)
+            lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value}")
+
+    family('document_seconds', "Wall time to process a document.",
+           [((('document', r['document']), ('status', r['status'])), r['wall_time'])
+            for r in records if r.get('wall_time') is not None])
+    family('stage_seconds', "Wall time per pipeline stage.",
+           [((('document', r['document']), ('stage', stage)), seconds)
+            for r in records for stage, seconds in r['stages'].items()])
+    family('count', "Per-document counters (pages, spans, drawing rects, candidates, headings).",
+           [((('document', r['document']), ('name', name)), value)
+            for r in records for name, value in r['counts'].items()])
+    family('peak_rss_bytes', "Peak resident memory while processing a document (scope=document) "
+           "or of its worker process so far (scope=process).",
+           [((('document', r['document']), ('scope', r.get('peak_rss_scope', SCOPE_PROCESS))),
+             r['peak_rss_bytes'])
+            for r in records if r.get('peak_rss_bytes') is not None])
+    return '\n'.join(lines) + '\n'
+
+def write_prometheus(records, path):
+    """Writes the records as a Prometheus text file, atomically so scrapers never see a partial file."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(format_prometheus(records))
+    os.replace(tmp_path, path)
@@ -1,70 +1,761 @@
 import os
-import json
 import time
+import argparse
+import itertools
+import signal
+import multiprocessing
+from collections import deque
+from operator import itemgetter
+from multiprocessing.connection import wait as wait_connections
+from concurrent.futures import ProcessPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 
 # Import the updated functions from our other Python files
-from pdf_parser import get_text_blocks
-from title_detector import find_title_blocks
-from heading_detector import detect_headings
+from pdf_parser import (StyleStats, get_text_blocks, get_block_store, iter_page_blocks, scan_style_stats,
+                        estimate_style_stats, first_page_height)
+from title_detector import find_title_blocks, remove_title_blocks
+from heading_detector import detect_headings, without_repeated
 from hierarchy_fixer import refine_heading_hierarchy # NEW IMPORT
+from bookmark_outline import detect_from_bookmarks
+from result_cache import ResultCache, DEFAULT_MAX_BYTES, cache_version
+from page_cache import PageCache
+from repeat_index import RepeatIndex
+from instrumentation import DocumentMetrics, StageReporter, NULL_METRICS, write_jsonl, write_prometheus
+from watcher import DirectoryWatcher, DEFAULT_POLL_INTERVAL
+from output_sinks import SINKS, DEFAULT_BATCH_SIZE, open_sink
+from archive_input import is_archive, iter_archive_pdfs, duplicate_archive_names
+from scheduling import schedule_longest_first, BatchProgress, with_progress, in_order
+from budgets import (FAILURES_MANIFEST, REASON_TIMEOUT, REASON_CRASHED, STAGE_START,
+                     limit_memory, failure_reason, failure_record)
 
-def process_pdf(pdf_path):
+def detect_pages(pages, body_style, min_font_size, metrics=NULL_METRICS, styles=None,
+                 repeat_index=None, repeat_counts=None):
+    """
+    Runs title and heading detection over a stream of per-page block lists.
+    styles is the StyleRegistry that gives the blocks their style IDs as the
+    pages are parsed (see StyleStats.add_page). With a complete repeat_index, the
+    repeated blocks are dropped before heading detection and counted in
+    repeat_counts (see heading_detector.without_repeated).
+
+    Returns:
+        tuple: (title_blocks, headings)
+    """
+    first_page_blocks = next(pages, [])
+    title_blocks = find_title_blocks(first_page_blocks, min_font_size, styles)
+
+    blocks_for_headings = itertools.chain(remove_title_blocks(first_page_blocks, title_blocks),
+                                          itertools.chain.from_iterable(pages))
+    if repeat_index is not None:
+        blocks_for_headings = without_repeated(blocks_for_headings, repeat_index, body_style, min_font_size,
+                                               repeat_counts)
+    headings = detect_headings(blocks_for_headings, body_style, min_font_size, metrics, styles)
+    return title_blocks, headings
+
+def detect_streaming(pdf_path, stats, metrics=NULL_METRICS, sample_styles=False, page_cache=None,
+                     repeat_index=None, repeat_counts=None):
+    """
+    Runs title and heading detection over a page-by-page stream of blocks, so
+    peak memory does not grow with the page count. The style statistics the
+    detectors need up front come from a cheap text-only pre-pass.
+
+    With sample_styles, the pre-pass only reads a stratified sample of pages
+    (see pdf_parser.estimate_style_stats). The exact statistics are known once
+    the stream has been parsed; if the estimate turns out to differ from them,
+    detection runs again with the exact values, so the output never changes.
+    An ambiguous sample falls back to the full pre-pass.
+
+    Args:
+        stats (StyleStats): Filled with the counters of the streamed pages.
+        page_cache (PageCache, optional): Serves unchanged pages of the stream
+                                          (the style pre-pass still reads them all).
+        repeat_index (RepeatIndex, optional): Filled by the pre-pass, so repeated
+                                              blocks can be dropped from the
+                                              stream; sample_styles is then
+                                              ignored, as the index needs every page.
+
+    Returns:
+        tuple: (title_blocks, headings) exactly as the in-memory pipeline produces them.
+    """
+    estimate = None
+    if sample_styles and repeat_index is None:
+        with metrics.stage('style_sample'):
+            estimate = estimate_style_stats(pdf_path)
+        metrics.set('style_estimate_used', int(estimate is not None))
+
+    if estimate is None:
+        with metrics.stage('style_scan'):
+            style_stats = scan_style_stats(pdf_path, repeat_index)
+        body_style = style_stats.body_style()
+        min_font_size = style_stats.min_font_size
+    else:
+        body_style = estimate.body_style()
+        min_font_size = estimate.min_font_size
+
+    # Parsing and detection are interleaved, so they are timed as one stage.
+    with metrics.stage('stream_detect'):
+        title_blocks, headings = detect_pages(iter_page_blocks(pdf_path, stats, page_cache), body_style,
+                                              min_font_size, metrics, stats.styles, repeat_index, repeat_counts)
+
+    if estimate is not None and (stats.body_style(), stats.min_font_size) != (body_style, min_font_size):
+        metrics.set('style_estimate_missed', 1)
+        metrics.set('heading_candidates', 0)
+        # The retry's statistics only number the styles again; the counters are already in stats.
+        retry_stats = StyleStats()
+        with metrics.stage('stream_detect_retry'):
+            title_blocks, headings = detect_pages(iter_page_blocks(pdf_path, retry_stats, page_cache),
+                                                  stats.body_style(), stats.min_font_size, metrics,
+                                                  retry_stats.styles)
+    return title_blocks, headings
+
+def document_name(pdf_path, name=None):
+    """Returns the name used in logs for a PDF given as a path or as bytes."""
+    if name:
+        return name
+    return os.path.basename(pdf_path) if isinstance(pdf_path, str) else '<memory>'
+
+def extract_outline(pdf_path, streaming=False, columnar=False, page_workers=1,
+                    use_bookmarks=False, sample_styles=False, page_cache=None, lazy_drawings=False,
+                    drop_repeated=False, metrics=NULL_METRICS, name=None):
     """
     Processes a single PDF file to extract its title and outline using refined logic.
+    Errors are raised to the caller; process_pdf is the variant that logs them.
 
     Args:
-        pdf_path (str): The full path to the PDF file.
+        pdf_path (str or bytes): The full path to the PDF file, or the PDF's bytes
+                                 (opened from memory, nothing is written to disk).
+        streaming (bool): Parse the PDF page by page instead of loading all blocks
+                          at once. Same output, flat memory on very long documents.
+        columnar (bool): Hold the blocks in a compact BlockStore instead of a list
+                         of dicts. Same output, less memory and faster filtering.
+        page_workers (int): Split the pages of this PDF across this many worker
+                            processes. Same output; ignored in streaming mode.
+        use_bookmarks (bool): Take the outline from the PDF's embedded bookmarks when
+                              they pass the quality checks in bookmark_outline, and
+                              only parse the first page for the title. The result
+                              then has an extra "outline_source" key.
+        sample_styles (bool): Stream like streaming mode, but estimate the body
+                              style from a sample of pages instead of a full
+                              pre-pass. Same output (see detect_streaming).
+        page_cache (PageCache, optional): Per-page parse cache; only pages whose
+                                          content changed since they were cached
+                                          are parsed. Same output.
+        lazy_drawings (bool): Only analyse the drawings of pages where drawn boxes
+                              can change the title or headings. Same output;
+                              ignored in streaming mode and with a page cache.
+        drop_repeated (bool): Drop spans that repeat on many pages in the same
+                              text (numbers aside), position and style, i.e.
+                              running headers, footers and page labels, before
+                              heading detection (see repeat_index). Changes the
+                              output; disables the sampling of sample_styles.
+        metrics (DocumentMetrics, optional): Receives stage timings and counters.
+        name (str, optional): Name used in log messages; defaults to the file name.
 
     Returns:
         dict: A dictionary containing the title and a list of headings (the outline).
-              Returns None if the PDF cannot be processed.
     """
-    try:
-        print(f"Processing: {os.path.basename(pdf_path)}")
-        
+    name = document_name(pdf_path, name)
+    print(f"Processing: {name}")
+    stats = StyleStats()
+
+    # The first page's height places the margin bands where numbers are folded (see repeat_index).
+    repeat_index = RepeatIndex(page_height=first_page_height(pdf_path)) if drop_repeated else None
+    repeat_counts = {}
+
+    from_bookmarks = None
+    if use_bookmarks:
+        with metrics.stage('bookmarks'):
+            from_bookmarks = detect_from_bookmarks(pdf_path, stats)
+        metrics.set('bookmark_outline', int(from_bookmarks is not None))
+
+    if from_bookmarks is not None:
+        # Fast path: headings from the bookmarks, title from the first page.
+        title_blocks, headings = from_bookmarks
+    elif streaming or sample_styles:
+        # Steps 1-3 over a page stream; see detect_streaming.
+        title_blocks, headings = detect_streaming(pdf_path, stats, metrics, sample_styles, page_cache,
+                                                  repeat_index, repeat_counts)
+    elif columnar:
+        with metrics.stage('parse'):
+            store, body_style, min_font_size = get_block_store(pdf_path, page_workers, stats, page_cache,
+                                                                lazy_drawings, repeat_index)
+        with metrics.stage('title'):
+            title_blocks = find_title_blocks(store, min_font_size, stats.styles)
+        with metrics.stage('headings'):
+            blocks_for_headings = store.without(b['_index'] for b in title_blocks)
+            if repeat_index is not None:
+                blocks_for_headings = without_repeated(blocks_for_headings, repeat_index, body_style,
+                                                       min_font_size, repeat_counts)
+            headings = detect_headings(blocks_for_headings, body_style, min_font_size, metrics, stats.styles)
+    else:
         # Step 1: Parse the PDF to get all blocks, body style, and minimum font size.
-        all_blocks, body_style, min_font_size = get_text_blocks(pdf_path)
+        with metrics.stage('parse'):
+            all_blocks, body_style, min_font_size = get_text_blocks(pdf_path, page_workers, stats, page_cache,
+                                                                     lazy_drawings, repeat_index)
 
         # Step 2: Detect the blocks that constitute the title.
-        title_blocks = find_title_blocks(all_blocks, min_font_size)
+        with metrics.stage('title'):
+            title_blocks = find_title_blocks(all_blocks, min_font_size, stats.styles)
 
-        title_text = ""
-        blocks_for_headings = all_blocks
+        with metrics.stage('headings'):
+            blocks_for_headings = remove_title_blocks(all_blocks, title_blocks)
+            if repeat_index is not None:
+                blocks_for_headings = without_repeated(blocks_for_headings, repeat_index, body_style,
+                                                       min_font_size, repeat_counts)
 
-        if title_blocks:
-            title_text = " ".join(b['text'] for b in title_blocks)
-            title_block_ids = set(id(b) for b in title_blocks)
-            blocks_for_headings = [b for b in all_blocks if id(b) not in title_block_ids]
+            # Step 3: Detect headings. Note: these will include a temporary '_style' key.
+            headings = detect_headings(blocks_for_headings, body_style, min_font_size, metrics, stats.styles)
 
-        # Step 3: Detect headings. Note: these will include a temporary '_style' key.
-        headings = detect_headings(blocks_for_headings, body_style, min_font_size)
+    if repeat_counts.get('repeated_blocks_dropped'):
+        print(f"Dropped {repeat_counts['repeated_blocks_dropped']} repeated header/footer span(s) from {name}, "
+              f"{repeat_counts['repeated_candidates_dropped']} of them heading candidates")
 
-        # NEW Step 4: Refine the heading hierarchy using the new fixer logic.
+    title_text = " ".join(b['text'] for b in title_blocks)
+
+    # NEW Step 4: Refine the heading hierarchy using the new fixer logic.
+    with metrics.stage('hierarchy'):
         refined_headings = refine_heading_hierarchy(headings)
 
-        # NEW Step 5: Clean up the temporary '_style' key before final output.
-        for heading in refined_headings:
-            if '_style' in heading:
-                del heading['_style']
+    if metrics.enabled:
+        metrics.set('pages', stats.page_count)
+        metrics.set('spans', stats.span_count)
+        metrics.set('drawing_rects', stats.drawing_rect_count)
+        metrics.set('column_blocks', stats.column_span_count)
+        metrics.set('headings', len(refined_headings))
+        if page_cache is not None:
+            metrics.set('cached_pages', stats.cached_page_count)
+        if lazy_drawings:
+            metrics.set('drawing_pages', stats.drawing_page_count)
+        for counter, value in repeat_counts.items():
+            metrics.set(counter, value)
 
-        # Step 6: Assemble the final JSON structure.
-        output_data = {
-            "title": title_text,
-            "outline": refined_headings # Use the refined list
-        }
-        
-        return output_data
+    # NEW Step 5: Clean up the temporary '_style' key before final output.
+    for heading in refined_headings:
+        if '_style' in heading:
+            del heading['_style']
 
+    # Step 6: Assemble the final JSON structure.
+    output_data = {
+        "title": title_text,
+        "outline": refined_headings # Use the refined list
+    }
+    if use_bookmarks:
+        output_data["outline_source"] = "bookmarks" if from_bookmarks is not None else "heuristics"
+
+    return output_data
+
+def process_pdf(pdf_path, metrics=NULL_METRICS, name=None, **options):
+    """
+    Runs extract_outline (see there for the options) and turns a failure into a
+    logged error.
+
+    Returns:
+        dict: The title and outline, or None if the PDF cannot be processed.
+    """
+    try:
+        return extract_outline(pdf_path, metrics=metrics, name=name, **options)
     except Exception as e:
-        print(f"Error processing {os.path.basename(pdf_path)}: {e}")
+        print(f"Error processing {document_name(pdf_path, name)}: {e}")
+        metrics.count('errors')
         return None
 
-def main():
+def process_pdf_instrumented(pdf_path, **options):
+    """
+    Runs process_pdf with a fresh DocumentMetrics and returns both, so pool
+    workers can send the metrics back with the result.
+
+    Returns:
+        tuple: (result or None, metrics record dict)
+    """
+    metrics = DocumentMetrics(document_name(pdf_path, options.get('name')))
+    result = process_pdf(pdf_path, metrics=metrics, **options)
+    metrics.finish('ok' if result else 'error')
+    return result, metrics.to_dict()
+
+def _cache_hit_record(name):
+    metrics = DocumentMetrics(name)
+    metrics.count('cache_hits')
+    return metrics.finish().to_dict()
+
+def cached_lookup(cache, source, name, instrument=False):
+    """
+    Looks a document up in the result cache before it is processed. Every run
+    mode goes through this and store_result, so they all log and record cache
+    hits the same way.
+
+    Args:
+        cache (ResultCache or None): The result cache; None skips the lookup.
+        source (str or bytes): The PDF's path or its bytes.
+        name (str): The document name used in log messages and metrics records.
+        instrument (bool): Attach a metrics record to a cache hit.
+
+    Returns:
+        tuple: (cache key, outcome). The key is None without a cache or when the
+               PDF cannot be read. outcome is None when the document still has
+               to be processed; otherwise it is the (name, result, metrics record)
+               to report for it: the cached result, or a failure (result None)
+               when the PDF cannot be read.
+    """
+    if cache is None:
+        return None, None
+    try:
+        cache_key = cache.make_key(source)
+    except OSError as e:
+        print(f"Error processing {name}: {e}")
+        return None, (name, None, None)
+    cached_result = cache.get(cache_key)
+    if cached_result is None:
+        return cache_key, None
+    print(f"Cache hit: {name}")
+    return cache_key, (name, cached_result, _cache_hit_record(name) if instrument else None)
+
+def store_result(cache, cache_key, result):
+    """Stores a fresh result under the key cached_lookup returned for it; failures are not stored."""
+    if result and cache is not None and cache_key is not None:
+        cache.put(cache_key, result)
+
+def run_sequential(pdf_files, input_dir, cache=None, options=None, instrument=False):
+    """
+    Processes the PDFs one after another in the current process, in the given order.
+    options are extra keyword arguments for process_pdf.
+
+    Yields:
+        tuple: (pdf_file, result, metrics record) for every PDF, where result is None
+               on failure and the record is None unless instrument is set.
+    """
+    for pdf_file in pdf_files:
+        pdf_path = os.path.join(input_dir, pdf_file)
+        cache_key, outcome = cached_lookup(cache, pdf_path, pdf_file, instrument)
+        if outcome is not None:
+            yield outcome
+            continue
+        if instrument:
+            result, record = process_pdf_instrumented(pdf_path, **(options or {}))
+        else:
+            result, record = process_pdf(pdf_path, **(options or {})), None
+        store_result(cache, cache_key, result)
+        yield pdf_file, result, record
+
+def run_parallel(pdf_files, input_dir, workers, cache=None, options=None, instrument=False):
+    """
+    Processes the PDFs on a pool of worker processes. Every worker opens its own
+    documents, so nothing from PyMuPDF is shared between processes. options are
+    extra keyword arguments for process_pdf.
+
+    Cache lookups and stores happen here in the parent; only misses are sent to
+    the workers.
+
+    Yields:
+        tuple: (pdf_file, result, metrics record) in completion order, where result
+               is None on failure and the record is None unless instrument is set.
+    """
+    cache_keys = {}
+    misses = []
+    for pdf_file in pdf_files:
+        cache_keys[pdf_file], outcome = cached_lookup(cache, os.path.join(input_dir, pdf_file), pdf_file,
+                                                      instrument)
+        if outcome is not None:
+            yield outcome
+            continue
+        misses.append(pdf_file)
+
+    if not misses:
+        return
+
+    task = process_pdf_instrumented if instrument else process_pdf
+    with ProcessPoolExecutor(max_workers=min(workers, len(misses))) as executor:
+        futures = {
+            executor.submit(task, os.path.join(input_dir, pdf_file), **(options or {})): pdf_file
+            for pdf_file in misses
+        }
+        for future in as_completed(futures):
+            pdf_file = futures[future]
+            record = None
+            try:
+                if instrument:
+                    result, record = future.result()
+                else:
+                    result = future.result()
+            except Exception as e:
+                # process_pdf handles its own errors; this catches a crashed worker.
+                print(f"Error processing {pdf_file}: {e}")
+                result = None
+            store_result(cache, cache_keys[pdf_file], result)
+            yield pdf_file, result, record
+
+def _isolated_worker(conn, pdf_path, options, instrument, max_memory_bytes):
+    """
+    Body of a run_isolated worker process. Sends ('stage', name) messages while
+    it runs, then one ('done', result, failure, record) message, where failure
+    is None or a (reason, detail) tuple.
+    """
+    ignore_sigint()
+    memory_limited = max_memory_bytes is not None and limit_memory(max_memory_bytes)
+    name = document_name(pdf_path)
+    metrics = StageReporter(name, conn)
+    failure = None
+    try:
+        result = extract_outline(pdf_path, metrics=metrics, **options)
+    except Exception as e:
+        print(f"Error processing {name}: {e}")
+        result = None
+        failure = (failure_reason(e, memory_limited), f"{type(e).__name__}: {e}" if str(e) else type(e).__name__)
+    record = metrics.finish('ok' if failure is None else failure[0]).to_dict() if instrument else None
+    conn.send(('done', result, failure, record))
+    conn.close()
+
+def run_isolated(pdf_files, input_dir, workers, cache=None, options=None, instrument=False,
+                 timeout=None, max_memory_mb=None, manifest_path=None):
+    """
+    Processes every PDF in a process of its own, at most workers at a time, under
+    a wall-clock budget (timeout, seconds) and a memory budget (max_memory_mb, see
+    budgets.limit_memory). A worker over its time budget is killed; one over its
+    memory budget fails its allocations or dies. Either way only that document
+    fails and the batch continues.
+
+    Every failure, including ordinary errors, is appended to the JSONL failures
+    manifest at manifest_path as soon as it happens, with the reason (timeout,
+    memory, error, crashed) and the last pipeline stage the document reached.
+
+    Yields:
+        tuple: (pdf_file, result, metrics record) in completion order, like run_parallel.
+    """
+    max_memory_bytes = int(max_memory_mb * 1024 * 1024) if max_memory_mb else None
+    options = options or {}
+
+    cache_keys = {}
+    pending = deque()
+    for pdf_file in pdf_files:
+        cache_keys[pdf_file], outcome = cached_lookup(cache, os.path.join(input_dir, pdf_file), pdf_file,
+                                                      instrument)
+        if outcome is not None:
+            yield outcome
+            continue
+        pending.append(pdf_file)
+
+    running = {}   # parent end of the pipe -> job dict
+
+    def launch(pdf_file):
+        parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(
+            target=_isolated_worker, daemon=True,
+            args=(child_conn, os.path.join(input_dir, pdf_file), options, instrument, max_memory_bytes))
+        process.start()
+        child_conn.close()  # So the parent sees EOF once the worker exits.
+        started = time.monotonic()
+        running[parent_conn] = {
+            'pdf_file': pdf_file, 'process': process, 'stage': STAGE_START, 'started': started,
+            'deadline': started + timeout if timeout else None, 'outcome': None,
+        }
+
+    def finish(conn, job, result, failure, record):
+        """Returns the (pdf_file, result, record) to yield, after logging any failure."""
+        del running[conn]
+        conn.close()
+        job['process'].join()
+        pdf_file = job['pdf_file']
+        if failure is not None:
+            reason, detail = failure
+            print(f"Failed: {pdf_file} ({reason} during stage '{job['stage']}')")
+            if manifest_path:
+                write_jsonl([failure_record(pdf_file, reason, job['stage'],
+                                            time.monotonic() - job['started'], detail)], manifest_path)
+            if instrument and record is None:
+                record = DocumentMetrics(pdf_file).finish(reason).to_dict()
+                record['wall_time'] = time.monotonic() - job['started']
+                record['peak_rss_bytes'] = None  # The worker is gone; this process's value would mislead.
+            if record is not None:
+                # A field of its own: counts are numeric and become Prometheus samples.
+                record['stage_reached'] = job['stage']
+        else:
+            store_result(cache, cache_keys[pdf_file], result)
+        return pdf_file, result, record
+
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                launch(pending.popleft())
+
+            deadlines = [job['deadline'] for job in running.values() if job['deadline'] is not None]
+            wait_timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            for conn in wait_connections(list(running), timeout=wait_timeout):
+                job = running[conn]
+                exited = False
+                try:
+                    while conn.poll():
+                        message = conn.recv()
+                        if message[0] == 'stage':
+                            job['stage'] = message[1]
+                        else:
+                            job['outcome'] = message[1:]
+                except (EOFError, OSError):
+                    exited = True
+                if job['outcome'] is not None:
+                    yield finish(conn, job, *job['outcome'])
+                elif exited:
+                    job['process'].join()
+                    detail = f"worker exited with code {job['process'].exitcode}"
+                    yield finish(conn, job, None, (REASON_CRASHED, detail), None)
+
+            now = time.monotonic()
+            for conn, job in list(running.items()):
+                if job['deadline'] is not None and now >= job['deadline'] and job['outcome'] is None:
+                    job['process'].kill()
+                    yield finish(conn, job, None, (REASON_TIMEOUT, f"killed after {timeout:g}s"), None)
+    finally:
+        # Reached on Ctrl+C or when the caller stops early: no worker outlives the batch.
+        for job in running.values():
+            job['process'].kill()
+            job['process'].join()
+
+def run_archives(archive_paths, workers, cache=None, options=None, instrument=False, max_in_flight=None):
+    """
+    Processes the PDF members of zip/tar archives without extracting them: every
+    member is read into memory and opened from its bytes. The results carry the
+    member's document name (see archive_input.member_document_name).
+
+    Unreadable members are yielded as failed documents, without a record.
+    Members are read one after another, and at most max_in_flight of them (default:
+    twice the workers) are held in memory at once; reading pauses until a result
+    comes back. With a single worker the members are processed in this process.
+
+    Yields:
+        tuple: (document name, result, metrics record) in completion order.
+    """
+    options = options or {}
+    max_in_flight = max(1, max_in_flight or 2 * workers)
+    members = itertools.chain.from_iterable(iter_archive_pdfs(path) for path in archive_paths)
+
+    if workers <= 1:
+        for name, data in members:
+            if data is None:
+                yield name, None, None  # Unreadable; iter_archive_pdfs reported why.
+                continue
+            cache_key, outcome = cached_lookup(cache, data, name, instrument)
+            if outcome is not None:
+                yield outcome
+                continue
+            if instrument:
+                result, record = process_pdf_instrumented(data, name=name, **options)
+            else:
+                result, record = process_pdf(data, name=name, **options), None
+            store_result(cache, cache_key, result)
+            yield name, result, record
+        return
+
+    task = process_pdf_instrumented if instrument else process_pdf
+    in_flight = {}   # future -> (document name, cache key)
+
+    def collect(futures):
+        for future in futures:
+            name, cache_key = in_flight.pop(future)
+            record = None
+            try:
+                if instrument:
+                    result, record = future.result()
+                else:
+                    result = future.result()
+            except Exception as e:
+                # process_pdf handles its own errors; this catches a crashed worker.
+                print(f"Error processing {name}: {e}")
+                result = None
+            store_result(cache, cache_key, result)
+            yield name, result, record
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for name, data in members:
+            if data is None:
+                yield name, None, None  # Unreadable; iter_archive_pdfs reported why.
+                continue
+            cache_key, outcome = cached_lookup(cache, data, name, instrument)
+            if outcome is not None:
+                yield outcome
+                continue
+            in_flight[executor.submit(task, data, name=name, **options)] = (name, cache_key)
+            del data  # Only the pending task holds the bytes now.
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                yield from collect(done)
+        yield from collect(as_completed(list(in_flight)))
+
+def ignore_sigint():
+    """Pool initializer: Ctrl+C is handled by the parent, which shuts the pool down cleanly."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _warm_up():
+    """No-op task used to start every pool worker before the first document arrives."""
+    return os.getpid()
+
+def run_watch(input_dir, sink, workers, cache=None, options=None, instrument=False,
+              poll_interval=DEFAULT_POLL_INTERVAL, metrics_jsonl=None, metrics_prom=None):
+    """
+    Long-running mode: keeps a pool of warm worker processes and processes every
+    PDF that appears or changes in input_dir, writing each result to the output
+    sink as soon as it is ready. Runs until interrupted (Ctrl+C / SIGINT).
+    The sink is flushed after every poll that finished documents.
+
+    A file that changes while it is being processed is processed again afterwards.
+    The Prometheus file, if any, holds the latest record of every document.
+    A worker that dies (a crash, or the OOM killer) breaks the pool: it is replaced,
+    and the documents that were on it are reported as failed until they change again.
+    """
+    watcher = DirectoryWatcher(input_dir, suffix='.pdf')
+    task = process_pdf_instrumented if instrument else process_pdf
+    in_flight = {}       # future -> (pdf_file, cache key, executor)
+    busy = set()
+    resubmit = set()
+    latest_records = {}
+
+    def new_pool():
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=ignore_sigint)
+        for future in [executor.submit(_warm_up) for _ in range(workers)]:
+            future.result()
+        return executor
+
+    def replace_pool(broken):
+        nonlocal executor
+        if executor is broken:
+            print("A worker process died; starting a new pool.")
+            broken.shutdown(wait=False)
+            executor = new_pool()
+
+    def report(pdf_file, result, record):
+        if result:
+            print(f"Successfully created output: {sink.write(pdf_file, result)}")
+        if record is not None:
+            latest_records[pdf_file] = record
+            if metrics_jsonl:
+                write_jsonl([record], metrics_jsonl)
+            if metrics_prom:
+                write_prometheus(list(latest_records.values()), metrics_prom)
+
+    def submit(pdf_file):
+        pdf_path = os.path.join(input_dir, pdf_file)
+        cache_key, outcome = cached_lookup(cache, pdf_path, pdf_file, instrument)
+        if outcome is not None:
+            report(*outcome)
+            return
+        try:
+            future = executor.submit(task, pdf_path, **(options or {}))
+        except BrokenProcessPool:
+            # Broken by a crash that no finished future has reported yet.
+            replace_pool(executor)
+            future = executor.submit(task, pdf_path, **(options or {}))
+        in_flight[future] = (pdf_file, cache_key, executor)
+        busy.add(pdf_file)
+
+    print(f"Watching '{input_dir}' with {workers} worker processes. Press Ctrl+C to stop.")
+    executor = new_pool()
+    try:
+        while True:
+            for pdf_file in watcher.poll():
+                if pdf_file in busy:
+                    resubmit.add(pdf_file)
+                else:
+                    submit(pdf_file)
+
+            if not in_flight:
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(in_flight, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                pdf_file, cache_key, pool = in_flight.pop(future)
+                busy.discard(pdf_file)
+                record = None
+                try:
+                    if instrument:
+                        result, record = future.result()
+                    else:
+                        result = future.result()
+                except BrokenProcessPool as e:
+                    # Every document on the pool fails with this, not only the one that crashed it.
+                    print(f"Error processing {pdf_file}: worker process died ({e})")
+                    replace_pool(pool)
+                    result = None
+                except Exception as e:
+                    print(f"Error processing {pdf_file}: {e}")
+                    result = None
+
+                store_result(cache, cache_key, result)
+                report(pdf_file, result, record)
+
+                if pdf_file in resubmit:
+                    resubmit.discard(pdf_file)
+                    submit(pdf_file)
+            sink.flush()
+    except KeyboardInterrupt:
+        print("\nStopping; pending documents are dropped, running ones are left to finish.")
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Extract the title and outline of every PDF in 'input/'.")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Number of worker processes for batch mode (default: number of cores).")
+    parser.add_argument('--sequential', action='store_true',
+                        help="Process the PDFs one by one in this process, in name order.")
+    parser.add_argument('--no-schedule', action='store_true',
+                        help="Start the PDFs in name order instead of the longest (most pages and bytes) first.")
+    parser.add_argument('--cache-dir',
+                        help="Directory of the result cache. Unchanged PDFs are not parsed again.")
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Size limit of the result cache; least recently used entries are evicted.")
+    parser.add_argument('--page-cache-dir',
+                        help="Directory of the per-page cache. Only the edited pages of a changed PDF are parsed again.")
+    parser.add_argument('--page-cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Size limit of the per-page cache; least recently used pages are evicted.")
+    parser.add_argument('--streaming', action='store_true',
+                        help="Parse each PDF page by page to keep memory flat on very long documents.")
+    parser.add_argument('--sample-styles', action='store_true',
+                        help="Streaming mode that estimates the body style from a sample of pages "
+                             "instead of a full pre-pass (same output).")
+    parser.add_argument('--columnar', action='store_true',
+                        help="Keep the parsed blocks in a compact column store instead of per-span dicts.")
+    parser.add_argument('--page-workers', type=int, default=1,
+                        help="Split the pages of each large PDF across this many processes. "
+                             "Files are then processed one at a time.")
+    parser.add_argument('--lazy-drawings', action='store_true',
+                        help="Only analyse the drawings of pages where boxes can change the outline (same output).")
+    parser.add_argument('--drop-repeated', action='store_true',
+                        help="Drop running headers, footers and page labels (spans repeated across pages) "
+                             "before heading detection.")
+    parser.add_argument('--use-bookmarks', action='store_true',
+                        help="Use a PDF's embedded bookmarks as its outline when they look reliable.")
+    parser.add_argument('--timeout', type=float,
+                        help="Wall-clock budget per PDF in seconds. With a budget, every PDF runs in a process "
+                             "of its own that is killed when it goes over; failures are listed in "
+                             f"output/{FAILURES_MANIFEST}.")
+    parser.add_argument('--max-memory-mb', type=float,
+                        help="Memory budget per PDF, on top of the worker's baseline (Linux/Unix only).")
+    parser.add_argument('--metrics-jsonl',
+                        help="Append per-document metrics (stage timings, counters, peak memory) to this JSONL file.")
+    parser.add_argument('--metrics-prom',
+                        help="Write the run's per-document metrics to this Prometheus text file.")
+    parser.add_argument('--sink', choices=SINKS, default='json',
+                        help="Output format: one JSON file per PDF (default), one JSONL file, or a SQLite database.")
+    parser.add_argument('--sink-path',
+                        help="File of the jsonl/sqlite sink (default: output/results.jsonl or output/results.sqlite).")
+    parser.add_argument('--sink-batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help="Documents per flush (jsonl) or transaction (sqlite).")
+    parser.add_argument('--archive', nargs='+', metavar='PATH',
+                        help="Process the PDFs inside these zip/tar archives instead of 'input/', "
+                             "without extracting them. Outputs are named after the member paths.")
+    parser.add_argument('--max-in-flight', type=int,
+                        help="Archive members held in memory at once (default: twice the workers).")
+    parser.add_argument('--watch', action='store_true',
+                        help="Keep running with warm workers and process PDFs as they appear or change in 'input/'.")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                        help="Seconds between scans of 'input/' in watch mode.")
+    return parser.parse_args(argv)
+
+def main(argv=None):
     """
     Main function to run the document outlining process.
     It looks for PDFs in the 'input' directory and saves the
     JSON results in the 'output' directory.
     """
+    args = parse_args(argv)
+
     script_dir = os.path.dirname(os.path.abspath(__file__))
     input_dir = os.path.join(script_dir, 'input')
     output_dir = os.path.join(script_dir, 'output')
@@ -73,36 +764,137 @@ def main():
     os.makedirs(input_dir, exist_ok=True)
     os.makedirs(output_dir, exist_ok=True)
 
-    try:
-        pdf_files = [f for f in os.listdir(input_dir) if f.lower().endswith('.pdf')]
-    except FileNotFoundError:
-        print(f"Error: The input directory was not found at '{input_dir}'")
-        return
+    options = {'streaming': args.streaming, 'columnar': args.columnar, 'page_workers': args.page_workers,
+               'use_bookmarks': args.use_bookmarks, 'sample_styles': args.sample_styles,
+               'lazy_drawings': args.lazy_drawings, 'drop_repeated': args.drop_repeated}
+
+    cache = None
+    if args.cache_dir:
+        cache = ResultCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024),
+                            version=cache_version(options))
+
+    if args.page_cache_dir:
+        # Not part of the result cache version: cached pages give the same output.
+        options['page_cache'] = PageCache(args.page_cache_dir, max_bytes=int(args.page_cache_max_mb * 1024 * 1024))
 
-    if not pdf_files:
-        print(f"No PDF files found in '{input_dir}' directory.")
-        print("Please add some PDF files to the 'input' folder to run the script.")
+    # Instrumentation is off unless a metrics output is requested.
+    instrument = bool(args.metrics_jsonl or args.metrics_prom)
+
+    if args.watch:
+        # Files are processed one per worker; page-level workers would nest pools.
+        options['page_workers'] = 1
+        with open_sink(args.sink, output_dir, args.sink_path, args.sink_batch_size) as sink:
+            run_watch(input_dir, sink, max(1, args.workers), cache, options, instrument,
+                      args.poll_interval, args.metrics_jsonl, args.metrics_prom)
         return
 
-    print(f"Found {len(pdf_files)} PDF(s) to process.")
-    start_time = time.time()
+    manifest_path = None
+    order = None
+    if args.archive:
+        for archive_path in args.archive:
+            if not is_archive(archive_path):
+                print(f"Error: '{archive_path}' is not a zip or tar archive.")
+                return
+        duplicates = duplicate_archive_names(args.archive)
+        if duplicates:
+            # Documents are named after the archive's file name, so their outputs would overwrite each other.
+            print(f"Error: several archives are named {', '.join(repr(name) for name in duplicates)}; "
+                  f"rename them so their outputs do not collide.")
+            return
+        print(f"Reading PDFs from {len(args.archive)} archive(s).")
+        if args.timeout or args.max_memory_mb:
+            print("Note: --timeout and --max-memory-mb only apply to PDFs read from 'input/'.")
+        start_time = time.time()
+        # As in directory mode, page-level parallelism replaces the document pool.
+        workers = 1 if args.sequential or args.page_workers > 1 else max(1, args.workers)
+        if workers > 1:
+            print(f"Using {workers} worker processes.")
+        results = run_archives(args.archive, workers, cache, options, instrument, args.max_in_flight)
+    else:
+        try:
+            # Name order is the order results are written and reported in.
+            pdf_files = sorted(f for f in os.listdir(input_dir) if f.lower().endswith('.pdf'))
+        except FileNotFoundError:
+            print(f"Error: The input directory was not found at '{input_dir}'")
+            return
 
-    for pdf_file in pdf_files:
-        pdf_path = os.path.join(input_dir, pdf_file)
-        result = process_pdf(pdf_path)
+        if not pdf_files:
+            print(f"No PDF files found in '{input_dir}' directory.")
+            print("Please add some PDF files to the 'input' folder to run the script.")
+            return
 
-        if result:
-            base_name = os.path.splitext(pdf_file)[0]
-            output_filename = f"{base_name}.json"
-            output_path = os.path.join(output_dir, output_filename)
+        print(f"Found {len(pdf_files)} PDF(s) to process.")
+        start_time = time.time()
 
-            with open(output_path, 'w', encoding='utf-8') as f:
-                json.dump(result, f, ensure_ascii=False, indent=4)
-            
-            print(f"Successfully created output: {output_path}")
+        # A single worker gains nothing from a pool, so it takes the sequential path too.
+        workers = max(1, min(args.workers, len(pdf_files)))
+        sequential = args.sequential or workers == 1 or args.page_workers > 1
+
+        # Costs come from the page counts and file sizes; with several documents
+        # in flight the longest start first (see scheduling.schedule_longest_first).
+        schedule, costs = schedule_longest_first(pdf_files, input_dir)
+        if args.no_schedule or (sequential and not (args.timeout or args.max_memory_mb)):
+            schedule = pdf_files
+        progress = BatchProgress(costs)
+        if args.timeout or args.max_memory_mb:
+            # Budgets need a killable process per document, so they take precedence.
+            # Workers are daemonic and cannot start page-level pools of their own.
+            options['page_workers'] = 1
+            manifest_path = os.path.join(output_dir, FAILURES_MANIFEST)
+            if os.path.exists(manifest_path):
+                os.remove(manifest_path)  # The manifest describes this run only.
+            workers = 1 if args.sequential else workers
+            print(f"Running each PDF in its own process ({workers} at a time) with a budget of "
+                  f"{f'{args.timeout:g}s' if args.timeout else 'unlimited time'} and "
+                  f"{f'{args.max_memory_mb:g} MB' if args.max_memory_mb else 'unlimited memory'}.")
+            results = run_isolated(schedule, input_dir, workers, cache, options, instrument,
+                                   args.timeout, args.max_memory_mb, manifest_path)
+        # With page-level parallelism the pool is used inside each document instead.
+        elif sequential:
+            results = run_sequential(schedule, input_dir, cache, options, instrument)
+        else:
+            print(f"Using {workers} worker processes.")
+            results = run_parallel(schedule, input_dir, workers, cache, options, instrument)
+        results = with_progress(results, progress)
+        order = pdf_files
+
+    succeeded = []
+    failed = []
+    records = []
+    with open_sink(args.sink, output_dir, args.sink_path, args.sink_batch_size) as sink:
+        if order is not None and sink.ordered:
+            # Rows of one file or table come out in name order. Per-document files are
+            # written as results arrive, so nothing is held back for them.
+            results = in_order(results, order)
+        for pdf_file, result, record in results:
+            if record is not None:
+                records.append(record)
+            if result:
+                output_path = sink.write(pdf_file, result)
+                succeeded.append(pdf_file)
+                print(f"Successfully created output: {output_path}")
+            else:
+                failed.append(pdf_file)
 
     end_time = time.time()
     print(f"\nProcessing complete. Total time: {end_time - start_time:.2f} seconds.")
+    print(f"Succeeded: {len(succeeded)}, Failed: {len(failed)}")
+    if cache is not None:
+        cache_stats = cache.stats()
+        print(f"Cache hits: {cache_stats['hits']}, misses: {cache_stats['misses']}")
+    for pdf_file in sorted(failed):
+        print(f"  Failed: {pdf_file}")
+    if manifest_path and os.path.exists(manifest_path):
+        print(f"Failures manifest: {manifest_path}")
+
+    if order is not None:
+        records.sort(key=itemgetter('document'))
+    if args.metrics_jsonl:
+        write_jsonl(records, args.metrics_jsonl)
+        print(f"Metrics appended to {args.metrics_jsonl}")
+    if args.metrics_prom:
+        write_prometheus(records, args.metrics_prom)
+        print(f"Metrics written to {args.metrics_prom}")
 
 
 if __name__ == '__main__':
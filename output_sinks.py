@@ -0,0 +1,201 @@
+import os
+import json
+import sqlite3
+
+SINKS = ('json', 'jsonl', 'sqlite')
+DEFAULT_BATCH_SIZE = 100
+
+def write_result(result, pdf_file, output_dir):
+    """
+    Writes the outline for a single PDF as an indented JSON file named after the PDF.
+    The file is written under a temporary name and renamed into place, so readers
+    never see a partial JSON file.
+
+    Args:
+        result (dict): The title/outline dictionary returned by process_pdf.
+        pdf_file (str): The file name of the source PDF, or its document name
+                        with '/' separators (archive members).
+        output_dir (str): The directory the JSON file is written to.
+
+    Returns:
+        str: The path of the written JSON file.
+    """
+    base_name = os.path.splitext(pdf_file)[0]
+    output_filename = f"{base_name}.json"
+    output_path = os.path.join(output_dir, output_filename)
+    if os.path.dirname(output_filename):
+        # Documents from archives are named after their member paths.
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    tmp_path = f"{output_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f, ensure_ascii=False, indent=4)
+    os.replace(tmp_path, output_path)
+
+    return output_path
+
+class OutputSink:
+    """
+    Destination of the results. write(pdf_file, result) stores one result and
+    returns a description of where it went, flush() hands everything written so
+    far to the file system, and close() flushes and releases the sink.
+
+    `ordered` is True for sinks whose rows keep the order they were written in;
+    batch mode feeds those in name order so their contents do not depend on which
+    worker finished first.
+    """
+
+    ordered = False
+
+    def write(self, pdf_file, result):
+        raise NotImplementedError
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+class JsonFileSink(OutputSink):
+    """The default sink: one indented JSON file per PDF in output_dir (see write_result)."""
+
+    def __init__(self, output_dir):
+        self.output_dir = output_dir
+
+    def write(self, pdf_file, result):
+        return write_result(result, pdf_file, self.output_dir)
+
+class JsonlSink(OutputSink):
+    """
+    Appends one compact JSON line per PDF to a single file:
+        {"document": "report.pdf", "title": ..., "outline": [...]}
+
+    Lines are buffered and written batch_size at a time with a single write, so
+    the per-document cost is a list append. A document processed again (watch
+    mode) gets a new line; readers should keep the last line per document.
+    """
+
+    ordered = True
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self._pending = []
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def write(self, pdf_file, result):
+        self._pending.append(json.dumps(dict(document=pdf_file, **result), ensure_ascii=False) + '\n')
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+        return f"{self.path} [{pdf_file}]"
+
+    def flush(self):
+        if self._pending:
+            self._file.write(''.join(self._pending))
+            self._pending = []
+        self._file.flush()
+
+    def close(self):
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+class SqliteSink(OutputSink):
+    """
+    Stores the results in a SQLite database with one row per document and one
+    row per heading:
+
+        documents(id, name, title, outline_source)
+        headings(document_id, position, level, text, page)
+
+    Inserts are grouped into transactions of batch_size documents. Document names
+    are unique; a document processed again replaces its earlier rows. Headings
+    are indexed by document and by page.
+    """
+
+    ordered = True
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS documents (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            title TEXT NOT NULL,
+            outline_source TEXT
+        );
+        CREATE UNIQUE INDEX IF NOT EXISTS documents_name ON documents(name);
+        CREATE TABLE IF NOT EXISTS headings (
+            document_id INTEGER NOT NULL REFERENCES documents(id),
+            position INTEGER NOT NULL,
+            level TEXT NOT NULL,
+            text TEXT NOT NULL,
+            page INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS headings_document ON headings(document_id, position);
+        CREATE INDEX IF NOT EXISTS headings_page ON headings(page);
+    """
+
+    def __init__(self, path, batch_size=DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.batch_size = max(1, batch_size)
+        self._pending = 0
+        self._conn = sqlite3.connect(path)
+        # WAL lets readers query the database while a long run is still writing it.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    def write(self, pdf_file, result):
+        conn = self._conn
+        previous = conn.execute("SELECT id FROM documents WHERE name = ?", (pdf_file,)).fetchone()
+        if previous is not None:
+            conn.execute("DELETE FROM headings WHERE document_id = ?", previous)
+            conn.execute("DELETE FROM documents WHERE id = ?", previous)
+
+        cursor = conn.execute("INSERT INTO documents (name, title, outline_source) VALUES (?, ?, ?)",
+                              (pdf_file, result['title'], result.get('outline_source')))
+        document_id = cursor.lastrowid
+        conn.executemany(
+            "INSERT INTO headings (document_id, position, level, text, page) VALUES (?, ?, ?, ?, ?)",
+            [(document_id, position, h['level'], h['text'], h['page'])
+             for position, h in enumerate(result['outline'])])
+
+        self._pending += 1
+        if self._pending >= self.batch_size:
+            self.flush()
+        return f"{self.path} [{pdf_file}]"
+
+    def flush(self):
+        self._conn.commit()
+        self._pending = 0
+
+    def close(self):
+        if self._conn is not None:
+            self.flush()
+            self._conn.close()
+            self._conn = None
+
+def open_sink(kind, output_dir, path=None, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Creates the output sink selected on the command line.
+
+    Args:
+        kind (str): One of SINKS.
+        output_dir (str): Directory of the JSON files, and of the default
+                          results.jsonl / results.sqlite.
+        path (str, optional): File of the JSONL or SQLite sink.
+        batch_size (int): Documents per flush (JSONL) or transaction (SQLite).
+    """
+    if kind == 'json':
+        return JsonFileSink(output_dir)
+    if kind == 'jsonl':
+        return JsonlSink(path or os.path.join(output_dir, 'results.jsonl'), batch_size)
+    if kind == 'sqlite':
+        return SqliteSink(path or os.path.join(output_dir, 'results.sqlite'), batch_size)
+    raise ValueError(f"Unknown sink '{kind}'; expected one of {', '.join(SINKS)}.")
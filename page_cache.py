@@ -0,0 +1,188 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+from pdf_parser import parse_page
+from result_cache import PIPELINE_VERSION, DEFAULT_MAX_BYTES
+
+DATABASE_NAME = 'pages.sqlite3'
+
+# Seconds a process waits for another one's write transaction before giving up.
+LOCK_TIMEOUT = 30.0
+
+# One connection per database and process; see PageCache.__reduce__. The process ID
+# is part of the key because a connection must not be used across a fork.
+_process_connections = {}
+
+def _connect(path):
+    key = (os.getpid(), path)
+    conn = _process_connections.get(key)
+    if conn is None:
+        # Autocommit; put() opens its own transaction.
+        conn = sqlite3.connect(path, timeout=LOCK_TIMEOUT, isolation_level=None)
+        # WAL lets the worker processes read while one of them writes.
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(PageCache.SCHEMA)
+        _process_connections[key] = conn
+    return conn
+
+class PageCache:
+    """
+    On-disk cache of parsed pages, so a re-saved PDF with a few edited pages only
+    has those pages parsed again. Entries are rows of a single SQLite database in
+    cache_dir, so opening the cache does not depend on how many pages it holds.
+    Once the entries total more than max_bytes, the least recently used ones are
+    evicted.
+
+    A page's key hashes everything parse_page depends on: the page's content
+    streams, the streams of the form XObjects it draws (text and boxes can live
+    there), its fonts, and its size and rotation. The page number is not part of
+    the key, so pages that only moved are still hits.
+
+    A PageCache can be passed to worker processes: each process opens its own
+    connection once, and they all share the database and its size limit.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS pages (
+            key TEXT PRIMARY KEY,
+            data TEXT NOT NULL,
+            size INTEGER NOT NULL,
+            used REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS pages_used ON pages(used);
+        CREATE TABLE IF NOT EXISTS totals (
+            id INTEGER PRIMARY KEY CHECK (id = 0),
+            entries INTEGER NOT NULL,
+            bytes INTEGER NOT NULL
+        );
+        INSERT OR IGNORE INTO totals VALUES (0, 0, 0);
+        CREATE TRIGGER IF NOT EXISTS pages_added AFTER INSERT ON pages BEGIN
+            UPDATE totals SET entries = entries + 1, bytes = bytes + NEW.size;
+        END;
+        CREATE TRIGGER IF NOT EXISTS pages_removed AFTER DELETE ON pages BEGIN
+            UPDATE totals SET entries = entries - 1, bytes = bytes - OLD.size;
+        END;
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, version=PIPELINE_VERSION):
+        self._config = (cache_dir, max_bytes, version)
+        self.max_bytes = max_bytes
+        self.version = f"page-{version}"
+        self.path = os.path.join(cache_dir, DATABASE_NAME)
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(cache_dir, exist_ok=True)
+        self._connection()  # Creates the database, and fails early if it cannot.
+
+    def __reduce__(self):
+        # Pickled as its configuration: a worker reuses the connection it already opened.
+        return (PageCache, self._config)
+
+    def _connection(self):
+        return _connect(self.path)
+
+    def page_key(self, doc, page):
+        """Returns the cache key of a page of an open document."""
+        digest = hashlib.sha256(self.version.encode('utf-8'))
+        digest.update(repr((tuple(page.rect), page.rotation)).encode('utf-8'))
+        for xref in page.get_contents():
+            digest.update(doc.xref_stream(xref) or b'')
+        for xobject in page.get_xobjects():
+            digest.update(doc.xref_stream(xobject[0]) or b'')
+        digest.update(repr(page.get_fonts()).encode('utf-8'))
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Returns the cached entry for key, or None on a miss."""
+        conn = self._connection()
+        try:
+            row = conn.execute("SELECT data FROM pages WHERE key = ?", (key,)).fetchone()
+            entry = json.loads(row[0]) if row is not None else None
+            if entry is not None:
+                conn.execute("UPDATE pages SET used = ? WHERE key = ?", (time.time(), key))
+        except (sqlite3.Error, ValueError) as e:
+            print(f"Warning: could not read page cache entry {key}: {e}")
+            entry = None
+        if entry is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return entry
+
+    def put(self, key, entry):
+        """Stores an entry and evicts the least recently used ones if the cache is over budget."""
+        data = json.dumps(entry, ensure_ascii=False)
+        conn = self._connection()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Delete, then insert, so the triggers keep the totals right.
+                conn.execute("DELETE FROM pages WHERE key = ?", (key,))
+                conn.execute("INSERT INTO pages (key, data, size, used) VALUES (?, ?, ?, ?)",
+                             (key, data, len(data.encode('utf-8')), time.time()))
+                self._evict(conn)
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            print(f"Warning: could not write page cache entry {key}: {e}")
+
+    def _evict(self, conn):
+        entries, total_bytes = conn.execute("SELECT entries, bytes FROM totals").fetchone()
+        excess = total_bytes - self.max_bytes
+        if excess <= 0:
+            return
+        # The oldest entries that free enough space; the newest one is always kept.
+        keys = []
+        cursor = conn.execute("SELECT key, size FROM pages ORDER BY used LIMIT ?", (entries - 1,))
+        for key, size in cursor:
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        cursor.close()
+        conn.executemany("DELETE FROM pages WHERE key = ?", keys)
+
+    def parse_page(self, doc, page, page_num):
+        """
+        Same as pdf_parser.parse_page, served from the cache when the page is
+        unchanged.
+
+        Returns:
+            tuple: (page_blocks, page_styles, min_font_size, drawing_rect_count, hit)
+        """
+        key = self.page_key(doc, page)
+        entry = self.get(key)
+        if entry is not None:
+            page_blocks = entry['blocks']
+            for block in page_blocks:
+                block['bbox'] = tuple(block['bbox'])
+                block['page'] = page_num
+            # The histogram is stored as a list to keep its key order, which decides body-style ties.
+            page_styles = {(size, font): count for size, font, count in entry['styles']}
+            min_font_size = entry['min_font_size'] if entry['min_font_size'] is not None else float('inf')
+            return page_blocks, page_styles, min_font_size, entry['drawing_rects'], True
+
+        page_blocks, page_styles, min_font_size, drawing_rect_count = parse_page(page, page_num)
+        self.put(key, {
+            'blocks': page_blocks,
+            'styles': [[size, font, count] for (size, font), count in page_styles.items()],
+            'min_font_size': None if min_font_size == float('inf') else min_font_size,
+            'drawing_rects': drawing_rect_count,
+        })
+        return page_blocks, page_styles, min_font_size, drawing_rect_count, False
+
+    def stats(self):
+        """Returns this process's hit/miss counters and the current size of the cache."""
+        entries, total_bytes = self._connection().execute("SELECT entries, bytes FROM totals").fetchone()
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'entries': entries,
+            'bytes': total_bytes,
+        }
@@ -1,14 +1,433 @@
 import fitz  # PyMuPDF
 import os
+import math
+from concurrent.futures import ProcessPoolExecutor
 from collections import defaultdict
 import json
+from spatial_index import RectIndex, column_block_indices
+from block_store import BlockStore
+from style_registry import StyleRegistry, is_bold
 
-def get_text_blocks(pdf_path):
+def open_document(source):
+    """
+    Opens a PDF from a file path or from its bytes (e.g. a request body or an
+    archive member), without writing anything to disk.
+    """
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=source, filetype="pdf")
+    return fitz.open(source)
+
+def first_page_height(source):
+    """Returns the height of a PDF's first page in points, or None if it has no pages."""
+    doc = open_document(source)
+    try:
+        return doc[0].rect.height if doc.page_count else None
+    finally:
+        doc.close()
+
+class StyleStats:
+    """
+    Running document-wide style statistics: the font-style histogram (characters
+    per (size, font name)) and the minimum font size. Pages are added as they are
+    parsed, so the statistics never need the spans themselves to be kept.
+
+    styles is the document's StyleRegistry: every added block gets the ID of its
+    style under 'style_id', for the detectors.
+    """
+
+    def __init__(self):
+        self.font_styles = defaultdict(int)
+        self.min_font_size = float('inf')
+        self.page_count = 0
+        self.span_count = 0
+        self.column_span_count = 0
+        self.drawing_rect_count = 0
+        self.cached_page_count = 0
+        self.drawing_page_count = 0
+        self.styles = StyleRegistry()
+
+    def add_page(self, page_styles, page_min_font_size, page_blocks=(), drawing_rect_count=0):
+        """
+        Adds one page's style histogram. Pages must be added in page order.
+        The page's blocks are given their style IDs; they and the drawing rects
+        otherwise only feed the counters.
+        """
+        for style, count in page_styles.items():
+            self.font_styles[style] += count
+        if page_min_font_size < self.min_font_size:
+            self.min_font_size = page_min_font_size
+        self.styles.add_blocks(page_blocks)
+        self.page_count += 1
+        self.span_count += len(page_blocks)
+        self.column_span_count += sum(1 for b in page_blocks if b['is_column_like'])
+        self.drawing_rect_count += drawing_rect_count
+
+    def body_style(self):
+        """Returns the most common style above the minimum font size as {'size', 'font'}."""
+        most_common_style = {'size': 0, 'font': ''}
+        if self.font_styles:
+            non_min_styles = {s: c for s, c in self.font_styles.items() if s[0] > self.min_font_size}
+            if non_min_styles:
+                top_style = max(non_min_styles, key=non_min_styles.get)
+                most_common_style['size'] = top_style[0]
+                most_common_style['font'] = top_style[1]
+        return most_common_style
+
+def _add_span_styles(raw_blocks, page_styles):
+    """Counts the characters per style on a page and returns the page's minimum font size."""
+    min_font_size = float('inf')
+    for block in raw_blocks:
+        if block['type'] == 0:
+            for line in block['lines']:
+                for span in line['spans']:
+                    text = span['text'].strip()
+                    if not text:
+                        continue
+                    size = round(span['size'])
+                    page_styles[(size, span['font'])] += len(text)
+                    if size < min_font_size:
+                        min_font_size = size
+    return min_font_size
+
+def _box_index(page):
+    """Returns a RectIndex of the page's non-filled drawing rects and their number."""
+    drawing_rects = []
+    for path in page.get_drawings():
+        # We are interested in closed, rectangular paths
+        if path['rect'] and not path['fill']: # Non-filled rectangles are likely borders
+             drawing_rects.append(path['rect'])
+    return RectIndex(drawing_rects), len(drawing_rects)
+
+def flag_boxed_blocks(page, page_blocks):
+    """
+    Sets 'is_in_box' on the blocks of a page parsed with drawings=False.
+
+    Returns:
+        int: The number of non-filled drawing rects on the page.
+    """
+    box_index, drawing_rect_count = _box_index(page)
+    if box_index:
+        for block in page_blocks:
+            block['is_in_box'] = box_index.any_contains(fitz.Rect(block['bbox']))
+    return drawing_rect_count
+
+def parse_page(page, page_num, drawings=True):
+    """
+    Extracts the text blocks of a single page and flags blocks that are part of
+    column/table layouts or inside drawn boxes.
+
+    Args:
+        page (fitz.Page): The page to parse.
+        page_num (int): The page number stored on every block.
+        drawings (bool): Analyse the page's drawings. If False, every block has
+                         is_in_box False until flag_boxed_blocks is called.
+
+    Returns:
+        tuple: A tuple containing:
+            - list: The text blocks of the page, each block being a dictionary.
+            - dict: The page's style histogram, {(size, font name): character count}.
+            - float: The minimum font size on the page (inf if it has no text).
+            - int: The number of non-filled drawing rects on the page.
+    """
+    # --- Detect drawn rectangles on the page ---
+    if drawings:
+        box_index, drawing_rect_count = _box_index(page)
+    else:
+        box_index, drawing_rect_count = None, 0
+    # --- End Box Detection ---
+
+    page_blocks = []
+    page_styles = defaultdict(int)
+    min_font_size = float('inf')
+    raw_blocks = page.get_text("dict")["blocks"]
+
+    column_indices = column_block_indices(raw_blocks)
+
+    for i, block in enumerate(raw_blocks):
+        if block['type'] == 0:
+            is_in_column = i in column_indices
+            for line in block['lines']:
+                for span in line['spans']:
+                    text = span['text'].strip()
+                    if not text:
+                        continue
+                    
+                    # --- Check if span is inside a detected box ---
+                    is_in_box = bool(box_index) and box_index.any_contains(fitz.Rect(span['bbox']))
+                    # --- End Check ---
+
+                    size = round(span['size'])
+                    page_styles[(size, span['font'])] += len(text)
+                    if size < min_font_size:
+                        min_font_size = size
+
+                    page_blocks.append({
+                        'bbox': span['bbox'],
+                        'text': text,
+                        'font_size': size,
+                        'font_name': span['font'],
+                        'page': page_num,
+                        'is_column_like': is_in_column,
+                        'is_in_box': is_in_box # Add the new flag
+                    })
+
+    return page_blocks, page_styles, min_font_size, drawing_rect_count
+
+def iter_page_blocks(pdf_path, stats=None, page_cache=None):
+    """
+    Streams the text blocks of a PDF one page at a time. Only the current page's
+    blocks are held in memory.
+
+    Args:
+        pdf_path (str or bytes): The file path to the PDF, or the PDF's bytes.
+        stats (StyleStats, optional): Updated with every page's style histogram
+                                      as the pages go by.
+        page_cache (PageCache, optional): Unchanged pages are read from this cache
+                                          instead of being parsed.
+
+    Yields:
+        list: The text blocks of each page, in page order.
+    """
+    doc = open_document(pdf_path)
+    try:
+        for page_num, page in enumerate(doc):
+            if page_cache is not None:
+                page_blocks, page_styles, page_min_font_size, drawing_rect_count, hit = \
+                    page_cache.parse_page(doc, page, page_num)
+                if stats is not None and hit:
+                    stats.cached_page_count += 1
+            else:
+                page_blocks, page_styles, page_min_font_size, drawing_rect_count = parse_page(page, page_num)
+            if stats is not None:
+                stats.add_page(page_styles, page_min_font_size, page_blocks, drawing_rect_count)
+            yield page_blocks
+    finally:
+        doc.close()
+
+MIN_PAGES_PER_CHUNK = 16
+CHUNKS_PER_WORKER = 4
+
+def parse_page_range(pdf_path, start, end):
+    """
+    Parses pages start..end-1 of a PDF in the calling process, which opens the
+    file itself. Used by the page-parallel parser.
+
+    Returns:
+        list: One (page_blocks, page_styles, page_min_font_size, drawing_rect_count)
+              tuple per page.
+    """
+    doc = open_document(pdf_path)
+    try:
+        results = []
+        for page_num in range(start, end):
+            page_blocks, page_styles, page_min_font_size, drawing_rect_count = parse_page(doc[page_num], page_num)
+            results.append((page_blocks, dict(page_styles), page_min_font_size, drawing_rect_count))
+        return results
+    finally:
+        doc.close()
+
+def iter_page_blocks_parallel(pdf_path, workers, stats=None):
+    """
+    Same as iter_page_blocks, but the page range is split into contiguous chunks
+    that are parsed by a pool of worker processes. Chunks are consumed in page
+    order, so the blocks and the merged style histogram (including its key order,
+    which decides ties for the body style) match a sequential parse exactly.
+
+    Short documents are parsed sequentially, as the pool would only add overhead.
+    """
+    doc = open_document(pdf_path)
+    page_count = doc.page_count
+    doc.close()
+
+    if workers <= 1 or page_count < 2 * MIN_PAGES_PER_CHUNK:
+        yield from iter_page_blocks(pdf_path, stats)
+        return
+
+    chunk_size = max(MIN_PAGES_PER_CHUNK, math.ceil(page_count / (workers * CHUNKS_PER_WORKER)))
+    ranges = [(start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=min(workers, len(ranges))) as executor:
+        futures = [executor.submit(parse_page_range, pdf_path, start, end) for start, end in ranges]
+        for future in futures:
+            for page_blocks, page_styles, page_min_font_size, drawing_rect_count in future.result():
+                if stats is not None:
+                    stats.add_page(page_styles, page_min_font_size, page_blocks, drawing_rect_count)
+                yield page_blocks
+
+def iter_text_blocks(pdf_path, stats=None):
+    """Streams the text blocks of a PDF one block at a time. See iter_page_blocks."""
+    for page_blocks in iter_page_blocks(pdf_path, stats):
+        yield from page_blocks
+
+def _raw_spans(raw_blocks):
+    """Yields (text, bbox, font size, font name) for the non-empty spans of get_text("dict") blocks."""
+    for block in raw_blocks:
+        if block['type'] == 0:
+            for line in block['lines']:
+                for span in line['spans']:
+                    text = span['text'].strip()
+                    if text:
+                        yield text, span['bbox'], round(span['size']), span['font']
+
+def scan_style_stats(pdf_path, repeat_index=None):
+    """
+    Computes the document's style statistics without building any blocks. This
+    skips drawing and column analysis, so it is much cheaper than a full parse;
+    it lets the detectors know the body style before the blocks are streamed.
+
+    Args:
+        repeat_index (RepeatIndex, optional): Also receives every page's spans,
+                                              so repeats are known before streaming.
+
+    Returns:
+        StyleStats: The statistics of the whole document.
+    """
+    stats = StyleStats()
+    doc = open_document(pdf_path)
+    try:
+        for page in doc:
+            page_styles = defaultdict(int)
+            raw_blocks = page.get_text("dict")["blocks"]
+            page_min_font_size = _add_span_styles(raw_blocks, page_styles)
+            stats.add_page(page_styles, page_min_font_size)
+            if repeat_index is not None:
+                repeat_index.add_spans(_raw_spans(raw_blocks))
+    finally:
+        doc.close()
+    return stats
+
+SAMPLE_PAGES = 24             # Strata of the page sample; one page is parsed from each.
+MIN_SAMPLE_CHARS = 2000       # Below this much sampled text the estimate is not trusted.
+MIN_SAMPLE_MARGIN = 0.25      # Lead of the top style over the runner-up, as a share of the sampled text.
+
+def sample_page_numbers(page_count, sample_pages=SAMPLE_PAGES):
+    """
+    Returns a stratified sample of page numbers: the page range is cut into
+    sample_pages equal strata and the middle page of each is taken, so every
+    part of the document is represented and the sample is deterministic.
+    """
+    if page_count <= sample_pages:
+        return list(range(page_count))
+    return [(i * page_count + (i + 1) * page_count) // (2 * sample_pages) for i in range(sample_pages)]
+
+def estimate_style_stats(pdf_path, sample_pages=SAMPLE_PAGES):
+    """
+    Estimates the document's style statistics from a stratified sample of pages
+    (text only, like scan_style_stats) instead of every page.
+
+    The estimate is only returned when it is unambiguous: enough sampled text,
+    and a body style that leads the runner-up by a clear margin. Documents short
+    enough that the sample would not save much always get None.
+
+    Returns:
+        StyleStats or None: The statistics of the sampled pages, or None when the
+                            caller should scan the whole document instead.
+    """
+    doc = open_document(pdf_path)
+    try:
+        if doc.page_count <= 2 * sample_pages:
+            return None
+        stats = StyleStats()
+        for page_num in sample_page_numbers(doc.page_count, sample_pages):
+            page_styles = defaultdict(int)
+            page_min_font_size = _add_span_styles(doc[page_num].get_text("dict")["blocks"], page_styles)
+            stats.add_page(page_styles, page_min_font_size)
+    finally:
+        doc.close()
+
+    counts = sorted((c for s, c in stats.font_styles.items() if s[0] > stats.min_font_size), reverse=True)
+    total = sum(counts)
+    if total < MIN_SAMPLE_CHARS:
+        return None
+    runner_up = counts[1] if len(counts) > 1 else 0
+    if (counts[0] - runner_up) / total < MIN_SAMPLE_MARGIN:
+        return None
+    return stats
+
+def parse_pages_lazily(pdf_path, stats=None, repeat_index=None):
+    """
+    Parses a PDF text first and analyses drawings only where they can matter.
+
+    Drawn boxes only change the result through the is_in_box flag of spans that
+    could become title or heading candidates, and which spans those are is only
+    known once the whole document's style statistics are. So every page is first
+    parsed without its drawings, then only the pages returned by
+    heading_detector.pages_needing_boxes are loaded again for get_drawings.
+    The blocks, and so the title and headings, are the same as with parse_page.
+
+    Args:
+        repeat_index (RepeatIndex, optional): Filled during the text pass. The
+                                              blocks it finds repeated are then
+                                              skipped when choosing the pages, as
+                                              heading detection will drop them.
+
+    Returns:
+        list: The text blocks of each page, in page order.
+    """
+    # Imported here because heading_detector imports this module.
+    from heading_detector import pages_needing_boxes
+
+    if stats is None:
+        stats = StyleStats()
+    doc = open_document(pdf_path)
+    try:
+        pages = []
+        for page_num, page in enumerate(doc):
+            page_blocks, page_styles, page_min_font_size, _ = parse_page(page, page_num, drawings=False)
+            stats.add_page(page_styles, page_min_font_size, page_blocks)
+            if repeat_index is not None:
+                repeat_index.add_page(page_blocks)
+            pages.append(page_blocks)
+
+        needed = pages_needing_boxes(pages, stats.body_style(), stats.min_font_size, stats.styles,
+                                     repeat_index)
+        for page_num in sorted(needed):
+            if page_num < len(pages):
+                stats.drawing_rect_count += flag_boxed_blocks(doc[page_num], pages[page_num])
+                stats.drawing_page_count += 1
+        return pages
+    finally:
+        doc.close()
+
+def _indexed(pages, repeat_index):
+    for page_blocks in pages:
+        repeat_index.add_page(page_blocks)
+        yield page_blocks
+
+def _iter_pages(pdf_path, page_workers, stats, page_cache, lazy_drawings=False, repeat_index=None):
+    if lazy_drawings and page_cache is None:
+        # The lazy parser needs the repeat index before it picks the pages, so it fills it itself.
+        return parse_pages_lazily(pdf_path, stats, repeat_index)
+    # The page cache is owned by this process, so cached runs parse sequentially.
+    if page_cache is not None:
+        pages = iter_page_blocks(pdf_path, stats, page_cache)
+    else:
+        pages = iter_page_blocks_parallel(pdf_path, page_workers, stats)
+    return pages if repeat_index is None else _indexed(pages, repeat_index)
+
+def get_text_blocks(pdf_path, page_workers=1, stats=None, page_cache=None, lazy_drawings=False,
+                    repeat_index=None):
     """
     Extracts text blocks and intelligently flags blocks that are part of column/table layouts or inside drawn boxes.
 
     Args:
-        pdf_path (str): The file path to the PDF.
+        pdf_path (str or bytes): The file path to the PDF, or the PDF's bytes.
+        page_workers (int): Worker processes to split the pages of this one PDF
+                            across (see iter_page_blocks_parallel).
+        stats (StyleStats, optional): Filled with the document's style statistics
+                                      and counters, for callers that need more
+                                      than the return values.
+        page_cache (PageCache, optional): Per-page cache; only pages whose content
+                                          changed are parsed. The style statistics
+                                          are merged from the cached histograms.
+                                          Takes precedence over page_workers.
+        lazy_drawings (bool): Only analyse the drawings of pages where boxes can
+                              change the title or headings (see
+                              parse_pages_lazily). Parses sequentially, and the
+                              page cache takes precedence.
+        repeat_index (RepeatIndex, optional): Receives every page's blocks as they
+                                              are parsed, to find running headers
+                                              and footers.
 
     Returns:
         tuple: A tuple containing:
@@ -16,76 +435,28 @@ def get_text_blocks(pdf_path):
             - dict: A dictionary with the most common 'size' and 'font' name (body style).
             - float: The minimum font size found in the document.
     """
-    doc = fitz.open(pdf_path)
+    if stats is None:
+        stats = StyleStats()
     all_blocks = []
-    font_styles = defaultdict(int)
-    min_font_size = float('inf')
-
-    for page_num, page in enumerate(doc):
-        # --- Detect drawn rectangles on the page ---
-        drawing_rects = []
-        for path in page.get_drawings():
-            # We are interested in closed, rectangular paths
-            if path['rect'] and not path['fill']: # Non-filled rectangles are likely borders
-                 drawing_rects.append(path['rect'])
-        # --- End Box Detection ---
-
-        page_blocks = []
-        raw_blocks = page.get_text("dict")["blocks"]
-
-        x_positions = defaultdict(list)
-        for i, block in enumerate(raw_blocks):
-            if block['type'] == 0:
-                x0 = round(block['bbox'][0] / 10) * 10
-                x_positions[x0].append(i)
-
-        column_block_indices = set()
-        for x0 in x_positions:
-            if len(x_positions[x0]) > 2:
-                for block_index in x_positions[x0]:
-                    column_block_indices.add(block_index)
-
-        for i, block in enumerate(raw_blocks):
-            if block['type'] == 0:
-                is_in_column = i in column_block_indices
-                for line in block['lines']:
-                    for span in line['spans']:
-                        text = span['text'].strip()
-                        if not text:
-                            continue
-                        
-                        # --- Check if span is inside a detected box ---
-                        span_rect = fitz.Rect(span['bbox'])
-                        is_in_box = False
-                        for rect in drawing_rects:
-                            if rect.contains(span_rect):
-                                is_in_box = True
-                                break
-                        # --- End Check ---
-
-                        size = round(span['size'])
-                        font_styles[(size, span['font'])] += len(text)
-                        if size < min_font_size:
-                            min_font_size = size
-
-                        page_blocks.append({
-                            'bbox': span['bbox'],
-                            'text': text,
-                            'font_size': size,
-                            'font_name': span['font'],
-                            'page': page_num,
-                            'is_column_like': is_in_column,
-                            'is_in_box': is_in_box # Add the new flag
-                        })
+    for page_blocks in _iter_pages(pdf_path, page_workers, stats, page_cache, lazy_drawings, repeat_index):
         all_blocks.extend(page_blocks)
-    doc.close()
 
-    most_common_style = {'size': 0, 'font': ''}
-    if font_styles:
-        non_min_styles = {s: c for s, c in font_styles.items() if s[0] > min_font_size}
-        if non_min_styles:
-            top_style = max(non_min_styles, key=non_min_styles.get)
-            most_common_style['size'] = top_style[0]
-            most_common_style['font'] = top_style[1]
+    return all_blocks, stats.body_style(), stats.min_font_size
+
+def get_block_store(pdf_path, page_workers=1, stats=None, page_cache=None, lazy_drawings=False,
+                    repeat_index=None):
+    """
+    Same as get_text_blocks, but stores the blocks in a compact BlockStore instead
+    of a list of dicts. Only one page's block dicts exist at any time, except
+    with lazy_drawings, where all of them are kept until the boxes are flagged.
+
+    Returns:
+        tuple: (BlockStore, body style dict, minimum font size).
+    """
+    if stats is None:
+        stats = StyleStats()
+    store = BlockStore(is_bold=is_bold)
+    for page_blocks in _iter_pages(pdf_path, page_workers, stats, page_cache, lazy_drawings, repeat_index):
+        store.extend(page_blocks)
 
-    return all_blocks, most_common_style, min_font_size
+    return store, stats.body_style(), stats.min_font_size
@@ -0,0 +1,157 @@
+import re
+import math
+import heapq
+
+# Spans repeating, with the same fingerprint, on at least this many pages and at
+# least this share of the document's pages are running headers, footers or labels.
+MIN_REPEAT_PAGES = 3
+MIN_REPEAT_FRACTION = 0.25
+
+# Span positions are rounded to this grid (points), so small jitter still matches.
+POSITION_GRID = 4.0
+
+# Numbers only become '#' in label-like spans: spans without letters (page numbers)
+# and spans lying entirely within these shares of the page height from its top or
+# bottom edge (running headers and footers, "Page 3 of 10"). Elsewhere they are
+# kept, so numbered headings at the same spot on many pages ("Section 3.1",
+# "Chapter 4", "Question 7") do not share a fingerprint. The top band is narrower:
+# headers sit close to the edge, and headings often start right below them.
+TOP_BAND_FRACTION = 0.06
+BOTTOM_BAND_FRACTION = 0.10
+
+# A folded label's width changes with its numbers ("Page 9" vs "Page 10"), which
+# moves its left edge; its centre moves half as much and is rounded more coarsely.
+LABEL_X_GRID = 36.0
+
+# Only short spans are indexed: headers and page labels are, and skipping body
+# lines keeps the counters for the spans that can repeat.
+MAX_FINGERPRINT_WORDS = 12
+MAX_FINGERPRINT_TEXT = 80
+
+DEFAULT_CAPACITY = 4096
+
+_DIGITS = re.compile(r'\d+')
+_SPACES = re.compile(r'\s+')
+_LETTER = re.compile(r'[^\W\d_]')
+
+def is_label_like(text, bbox, page_height=None):
+    """
+    True for spans whose numbers are counters rather than content: spans with
+    digits and no letters, and, when the page height is known, spans that lie
+    entirely in the top or bottom margin band.
+    """
+    if not _LETTER.search(text):
+        return bool(_DIGITS.search(text))
+    if page_height:
+        return (bbox[3] <= TOP_BAND_FRACTION * page_height or
+                bbox[1] >= (1 - BOTTOM_BAND_FRACTION) * page_height)
+    return False
+
+def fingerprint(text, bbox, font_size, font_name, page_height=None):
+    """
+    Returns the fingerprint of a span: its text lowercased with whitespace
+    collapsed, its rounded position and its style. In label-like spans (see
+    is_label_like) every number is replaced by '#', so "Page 3 of 10" and
+    "Page 4 of 10" match, and the position is the rounded centre instead of the
+    left edge. Returns None for spans that are too long to be headers or footers.
+    """
+    if len(text.split()) > MAX_FINGERPRINT_WORDS:
+        return None
+    text = text.lower()
+    if is_label_like(text, bbox, page_height):
+        text = _DIGITS.sub('#', text)
+        x = ('centre', round((bbox[0] + bbox[2]) / 2 / LABEL_X_GRID))
+    else:
+        x = round(bbox[0] / POSITION_GRID)
+    normalised = _SPACES.sub(' ', text).strip()[:MAX_FINGERPRINT_TEXT]
+    return (normalised, x, round(bbox[1] / POSITION_GRID), font_size, font_name)
+
+class RepeatIndex:
+    """
+    Cross-page index of repeated spans, built in one pass as the pages are parsed
+    and in bounded memory: the pages per fingerprint are counted with the
+    space-saving algorithm, which keeps at most `capacity` counters. When a new
+    fingerprint arrives and the table is full, the smallest counter is reused, and
+    its count is recorded as the newcomer's possible overcount.
+
+    A fingerprint is only reported as repeated when its count minus that
+    overcount (a guaranteed lower bound on its pages) reaches the threshold, so
+    eviction can miss a repeat on a span-dense document but never flags a span
+    that does not repeat.
+
+        index = RepeatIndex(page_height=first_page_height(pdf_path))
+        for page_blocks in pages:
+            index.add_page(page_blocks)
+        kept = [b for b in blocks if not index.is_repeated(b)]
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, page_height=None):
+        self.capacity = capacity
+        self.page_height = page_height   # Of the first page; places the margin bands.
+        self.page_count = 0
+        self._counts = {}    # fingerprint -> [pages, overcount]
+        self._heap = []      # (pages, sequence, fingerprint), stale entries skipped lazily
+        self._sequence = 0
+        self._repeated = None
+
+    def _push(self, key, pages):
+        self._sequence += 1
+        heapq.heappush(self._heap, (pages, self._sequence, key))
+
+    def _evict_smallest(self):
+        """Removes the smallest counter and returns its page count."""
+        while True:
+            pages, _, key = heapq.heappop(self._heap)
+            entry = self._counts.get(key)
+            if entry is not None and entry[0] == pages:
+                del self._counts[key]
+                return pages
+
+    def key(self, text, bbox, font_size, font_name):
+        """Returns the fingerprint of a span on this document's pages."""
+        return fingerprint(text, bbox, font_size, font_name, self.page_height)
+
+    def block_key(self, block):
+        return fingerprint(block['text'], block['bbox'], block['font_size'], block['font_name'], self.page_height)
+
+    def add_page(self, page_blocks):
+        """Counts the fingerprints of one page's blocks, each at most once."""
+        self.add_spans((b['text'], b['bbox'], b['font_size'], b['font_name']) for b in page_blocks)
+
+    def add_spans(self, spans):
+        """Same as add_page, for one page's (text, bbox, font size, font name) tuples."""
+        self.page_count += 1
+        self._repeated = None
+        seen = set()
+        for span in spans:
+            key = self.key(*span)
+            if key is None or key in seen:
+                continue
+            seen.add(key)
+            entry = self._counts.get(key)
+            if entry is not None:
+                entry[0] += 1
+            else:
+                overcount = self._evict_smallest() if len(self._counts) >= self.capacity else 0
+                entry = self._counts[key] = [overcount + 1, overcount]
+            self._push(key, entry[0])
+        # Every update leaves a stale heap entry behind; rebuild before they dominate.
+        if len(self._heap) > 4 * max(self.capacity, len(self._counts)):
+            self._heap = [(entry[0], 0, key) for key, entry in self._counts.items()]
+            heapq.heapify(self._heap)
+
+    def threshold(self):
+        """Returns the number of pages a fingerprint must repeat on."""
+        return max(MIN_REPEAT_PAGES, math.ceil(MIN_REPEAT_FRACTION * self.page_count))
+
+    def repeated(self):
+        """Returns the set of fingerprints that repeat on enough pages."""
+        if self._repeated is None:
+            threshold = self.threshold()
+            self._repeated = {key for key, (pages, overcount) in self._counts.items()
+                              if pages - overcount >= threshold}
+        return self._repeated
+
+    def is_repeated(self, block):
+        repeated = self.repeated()
+        return bool(repeated) and self.block_key(block) in repeated
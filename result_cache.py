@@ -0,0 +1,140 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+# Bump this whenever a change to the parser or the detectors can change the output,
+# so that results produced by older heuristics are never served from the cache.
+PIPELINE_VERSION = "3"
+
+# process_pdf options that change the output. Results produced with them enabled
+# are keyed under a different version, so they never mix with the default output.
+OUTPUT_OPTIONS = ('use_bookmarks', 'drop_repeated')
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+CHUNK_SIZE = 1024 * 1024
+
+def cache_version(options=None):
+    """Returns the cache version for a set of process_pdf options, e.g. "1+use_bookmarks"."""
+    enabled = [name for name in OUTPUT_OPTIONS if (options or {}).get(name)]
+    return '+'.join([PIPELINE_VERSION] + enabled)
+
+class ResultCache:
+    """
+    On-disk cache of pipeline results, keyed by a hash of the PDF content and the
+    pipeline version. Entries are JSON files; once the total size goes over
+    max_bytes the least recently used entries are evicted.
+
+    The cache is meant to be owned by a single process. Worker processes return
+    their results to the owner, which stores them. Threads of the owner may share
+    it; the files are hashed outside the lock.
+    """
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_MAX_BYTES, version=PIPELINE_VERSION):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+        # Rebuild the LRU order from the files' modification times, oldest first.
+        entries = []
+        for entry in os.scandir(cache_dir):
+            if entry.is_file() and entry.name.endswith('.json'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name[:-len('.json')], stat.st_size))
+        entries.sort()
+        self._entries = OrderedDict((key, size) for _, key, size in entries)
+        self._total_bytes = sum(self._entries.values())
+        self._evict()  # The size limit may have been lowered since the last run.
+
+    def make_key(self, pdf_path):
+        """
+        Returns the cache key for a PDF: a SHA-256 of the pipeline version and the
+        file content. pdf_path may also be the PDF's bytes.
+        """
+        digest = hashlib.sha256(self.version.encode('utf-8'))
+        if isinstance(pdf_path, (bytes, bytearray, memoryview)):
+            digest.update(pdf_path)
+            return digest.hexdigest()
+        with open(pdf_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """Returns the cached result for key, or None on a miss."""
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key):
+        if key not in self._entries:
+            self.misses += 1
+            return None
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                result = json.load(f)
+        except (OSError, ValueError):
+            # The entry vanished or is corrupt; forget it and treat this as a miss.
+            self._forget(key)
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(key)
+        try:
+            os.utime(self._path(key))  # Keeps the LRU order across runs.
+        except OSError:
+            pass
+        return result
+
+    def put(self, key, result):
+        """Stores a result and evicts the least recently used entries if the cache is over budget."""
+        with self._lock:
+            self._put(key, result)
+
+    def _put(self, key, result):
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            size = os.path.getsize(path)
+        except OSError as e:
+            print(f"Warning: could not write cache entry {key}: {e}")
+            return
+
+        if key in self._entries:
+            self._forget(key)
+        self._entries[key] = size
+        self._total_bytes += size
+        self._evict()
+
+    def _forget(self, key):
+        self._total_bytes -= self._entries.pop(key, 0)
+
+    def _evict(self):
+        while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            self._forget(key)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+
+    def stats(self):
+        """Returns the hit/miss counters and the current size of the cache."""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'bytes': self._total_bytes,
+            }
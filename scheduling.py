@@ -0,0 +1,115 @@
+import os
+import time
+
+from pdf_parser import open_document
+
+# A file's bytes count as pages at this rate, so image-heavy documents with few
+# pages are not scheduled as if they were cheap.
+BYTES_PER_PAGE = 256 * 1024
+
+def document_cost(pdf_path):
+    """
+    Returns the page count and file size of a PDF without parsing any page:
+    opening a document only reads its xref and page tree.
+
+    Returns:
+        tuple: (page count, or None if the PDF cannot be opened; size in bytes)
+    """
+    try:
+        file_size = os.path.getsize(pdf_path)
+    except OSError:
+        return None, 0
+    try:
+        doc = open_document(pdf_path)
+    except Exception:
+        return None, file_size  # Fails again, with a proper error, when processed.
+    try:
+        return doc.page_count, file_size
+    finally:
+        doc.close()
+
+def estimated_cost(page_count, file_size):
+    """Returns the estimated work for a document, in pages."""
+    return (page_count or 0) + file_size / BYTES_PER_PAGE
+
+def schedule_longest_first(pdf_files, input_dir):
+    """
+    Orders the PDFs by estimated cost, most expensive first, so the long documents
+    start while the others fill the remaining workers instead of one of them
+    starting last and setting the batch's wall time. Ties keep name order.
+
+    Returns:
+        tuple: (list of PDF file names in processing order, {file name: cost})
+    """
+    costs = {}
+    for pdf_file in pdf_files:
+        costs[pdf_file] = estimated_cost(*document_cost(os.path.join(input_dir, pdf_file)))
+    order = sorted(pdf_files, key=lambda pdf_file: (-costs[pdf_file], pdf_file))
+    return order, costs
+
+class BatchProgress:
+    """
+    Progress of a batch, weighted by the estimated cost of every document. The
+    time remaining is extrapolated from the cost finished so far:
+
+        progress = BatchProgress(costs)
+        for pdf_file, result, record in results:
+            print(progress.finish(pdf_file))
+    """
+
+    def __init__(self, costs):
+        self.costs = costs
+        self.total_cost = sum(costs.values())
+        self.done_cost = 0.0
+        self.done_count = 0
+        self.start = time.monotonic()
+
+    def finish(self, pdf_file):
+        """Marks a document as finished and returns a progress line."""
+        self.done_count += 1
+        self.done_cost += self.costs.get(pdf_file, 0.0)
+        return self.report()
+
+    def eta_seconds(self):
+        """Returns the estimated seconds remaining, or None before any work is done."""
+        if self.done_cost <= 0:
+            return None
+        elapsed = time.monotonic() - self.start
+        return elapsed * max(0.0, self.total_cost - self.done_cost) / self.done_cost
+
+    def report(self):
+        share = self.done_cost / self.total_cost if self.total_cost else 1.0
+        eta = self.eta_seconds()
+        eta_text = f"~{eta:.0f}s remaining" if eta is not None else "estimating time remaining"
+        return (f"Progress: {self.done_count}/{len(self.costs)} PDF(s), "
+                f"{share:.0%} of the estimated work, {eta_text}")
+
+def with_progress(results, progress):
+    """Re-yields (name, ...) tuples in arrival order, printing a progress line after each."""
+    for item in results:
+        print(progress.finish(item[0]))
+        yield item
+
+def in_order(results, names):
+    """
+    Reorder buffer: re-yields (name, ...) tuples that arrive in any order in the
+    order of names. A result is held back until every name before it is done,
+    so the output and logs of a run do not depend on which worker finished first.
+    Results for names that are not listed are yielded at the end.
+    """
+    position = {name: i for i, name in enumerate(names)}
+    held = {}
+    next_position = 0
+    unlisted = []
+    for item in results:
+        if item[0] not in position:
+            unlisted.append(item)
+            continue
+        held[position[item[0]]] = item
+        while next_position in held:
+            yield held.pop(next_position)
+            next_position += 1
+    # Only reached when a listed name never arrived; release the rest in order.
+    for i in sorted(held):
+        yield held[i]
+    yield from unlisted
@@ -0,0 +1,335 @@
+"""
+Local HTTP service around process_pdf for callers that already hold PDF bytes.
+
+    python server.py --port 8080 --workers 4 --max-queue 16
+
+Endpoints:
+    POST /outline   Body: the raw PDF. Returns {"title": ..., "outline": [...]}.
+                    An optional ?name= query is used in logs.
+    POST /batch     Body: {"documents": [{"name": "...", "data": "<base64 PDF>"}, ...]}.
+                    Returns {"results": [{"name": ..., "result": {...}} or
+                                         {"name": ..., "error": "..."}, ...]} in request order.
+    GET  /health    Returns the number of documents in flight and the capacity.
+
+PDFs are opened from memory with fitz.open(stream=...); nothing touches the disk.
+Work runs on a bounded process pool. When the pool and its queue are full, new
+requests get 429 Too Many Requests instead of waiting. A worker that dies (a
+crash or the OOM killer) breaks the pool: it is replaced, and the requests that
+were running on it get 503 Service Unavailable so they can be retried.
+"""
+import os
+import sys
+import json
+import base64
+import argparse
+import binascii
+import threading
+from http import HTTPStatus
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from main import process_pdf, ignore_sigint, cached_lookup, store_result
+from result_cache import ResultCache, DEFAULT_MAX_BYTES, cache_version
+
+DEFAULT_PORT = 8080
+DEFAULT_MAX_QUEUE = 16
+MAX_BODY_BYTES = 200 * 1024 * 1024
+RETRY_AFTER_SECONDS = 1
+
+class WorkerCrashed(Exception):
+    """A worker process died while a document was queued or running on it."""
+
+class OutlineService:
+    """
+    Owns the worker pool, the admission control and the optional result cache.
+    Thread-safe: HTTP handler threads call it concurrently.
+    """
+
+    def __init__(self, workers, max_queue=DEFAULT_MAX_QUEUE, cache=None, options=None):
+        self.workers = workers
+        self.capacity = workers + max_queue
+        self.options = options or {}
+        self.cache = cache
+        self.executor = self._new_executor()
+        self._executor_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.capacity)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+    def _new_executor(self):
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=ignore_sigint)
+
+    def _replace_executor(self, broken):
+        """
+        Replaces a broken pool with a fresh one. The threads whose documents were on
+        the broken pool all call this; only the first one replaces it.
+        """
+        with self._executor_lock:
+            if self.executor is broken:
+                print("A worker process died; starting a new pool.")
+                self.executor = self._new_executor()
+                broken.shutdown(wait=False)
+
+    def _submit_to_pool(self, data, name):
+        executor = self.executor
+        try:
+            return executor.submit(process_pdf, data, name=name, **self.options), executor
+        except BrokenProcessPool:
+            # Broken by a crash that no waiting request has noticed yet.
+            self._replace_executor(executor)
+            executor = self.executor
+            return executor.submit(process_pdf, data, name=name, **self.options), executor
+
+    def try_acquire(self, count):
+        """Reserves count queue slots at once, or none of them. Returns True on success."""
+        acquired = 0
+        while acquired < count and self._slots.acquire(blocking=False):
+            acquired += 1
+        if acquired < count:
+            for _ in range(acquired):
+                self._slots.release()
+            return False
+        with self._lock:
+            self._in_flight += count
+        return True
+
+    def release(self, count=1):
+        with self._lock:
+            self._in_flight -= count
+        for _ in range(count):
+            self._slots.release()
+
+    def submit(self, data, name):
+        """
+        Starts processing one PDF (a slot must have been acquired) and returns a
+        callable that waits for its result. Cache hits complete immediately. The
+        callable raises WorkerCrashed if the pool broke before the result arrived.
+        If submit itself raises, the slot has been released.
+        """
+        try:
+            cache_key, outcome = cached_lookup(self.cache, data, name)
+            if outcome is not None:
+                self.release()
+                return lambda: outcome[1]
+            future, executor = self._submit_to_pool(data, name)
+        except Exception:
+            self.release()
+            raise
+
+        def wait_result():
+            try:
+                result = future.result()
+            except BrokenProcessPool as e:
+                # Every document on the pool fails with this, not only the one that crashed it.
+                print(f"Error processing {name}: worker process died ({e})")
+                self._replace_executor(executor)
+                raise WorkerCrashed(name) from e
+            except Exception as e:
+                # process_pdf handles its own errors; this catches a crashed worker.
+                print(f"Error processing {name}: {e}")
+                result = None
+            finally:
+                self.release()
+            store_result(self.cache, cache_key, result)
+            return result
+
+        return wait_result
+
+    def status(self):
+        with self._lock:
+            status = {'in_flight': self._in_flight, 'capacity': self.capacity, 'workers': self.workers}
+        if self.cache is not None:
+            status['cache'] = self.cache.stats()
+        return status
+
+    def shutdown(self):
+        with self._executor_lock:
+            self.executor.shutdown(wait=True)
+
+class OutlineRequestHandler(BaseHTTPRequestHandler):
+    server_version = 'PDFOutline/1.0'
+    protocol_version = 'HTTP/1.1'
+
+    @property
+    def service(self):
+        return self.server.service
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status, message, headers=None):
+        self._send_json(status, {'error': message}, headers)
+
+    def _send_crashed(self):
+        self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, "A worker process died; retry the request.",
+                         {'Retry-After': str(RETRY_AFTER_SECONDS)})
+
+    def _send_busy(self):
+        self._send_error(HTTPStatus.TOO_MANY_REQUESTS, "Server is at capacity, retry later.",
+                         {'Retry-After': str(RETRY_AFTER_SECONDS)})
+
+    def _read_body(self):
+        """Returns the request body, or None after sending an error response."""
+        try:
+            length = int(self.headers.get('Content-Length', ''))
+        except ValueError:
+            self._send_error(HTTPStatus.LENGTH_REQUIRED, "Content-Length is required.")
+            return None
+        if length < 0:
+            self._send_error(HTTPStatus.BAD_REQUEST, "Content-Length must not be negative.")
+            return None
+        if length > MAX_BODY_BYTES:
+            self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body exceeds {MAX_BODY_BYTES} bytes.")
+            return None
+        return self.rfile.read(length)
+
+    def do_GET(self):
+        if urlparse(self.path).path == '/health':
+            self._send_json(HTTPStatus.OK, dict(status='ok', **self.service.status()))
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, "Unknown endpoint.")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path == '/outline':
+            self._handle_outline(parse_qs(url.query).get('name', ['<request>'])[0])
+        elif url.path == '/batch':
+            self._handle_batch()
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, "Unknown endpoint.")
+
+    def _handle_outline(self, name):
+        data = self._read_body()
+        if data is None:
+            return
+        if not data:
+            self._send_error(HTTPStatus.BAD_REQUEST, "Empty body; send the PDF bytes.")
+            return
+        if not self.service.try_acquire(1):
+            self._send_busy()
+            return
+
+        try:
+            wait_result = self.service.submit(data, name)
+        except Exception as e:
+            print(f"Error submitting {name}: {e}")
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, "The PDF could not be submitted.")
+            return
+        try:
+            result = wait_result()
+        except WorkerCrashed:
+            self._send_crashed()
+            return
+        if result:
+            self._send_json(HTTPStatus.OK, result)
+        else:
+            self._send_error(HTTPStatus.UNPROCESSABLE_ENTITY, "The PDF could not be processed.")
+
+    def _handle_batch(self):
+        body = self._read_body()
+        if body is None:
+            return
+        try:
+            documents = json.loads(body)['documents']
+            decoded = [(str(doc.get('name', f'document-{i}')), base64.b64decode(doc['data'], validate=True))
+                       for i, doc in enumerate(documents)]
+        except (ValueError, KeyError, TypeError, AttributeError, binascii.Error):
+            self._send_error(HTTPStatus.BAD_REQUEST,
+                             'Expected {"documents": [{"name": ..., "data": <base64 PDF>}, ...]}.')
+            return
+        if not decoded:
+            self._send_json(HTTPStatus.OK, {'results': []})
+            return
+        if len(decoded) > self.service.capacity:
+            self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                             f"A batch may hold at most {self.service.capacity} documents.")
+            return
+        if not self.service.try_acquire(len(decoded)):
+            self._send_busy()
+            return
+
+        # Submit everything first so the documents run in parallel, then collect in order.
+        waiters = []
+        try:
+            for name, data in decoded:
+                waiters.append((name, self.service.submit(data, name)))
+        except Exception as e:
+            print(f"Error submitting batch document {name}: {e}")
+            # submit released the failing document's slot. The documents after it were
+            # never submitted, and the submitted ones release theirs once waited for.
+            self.service.release(len(decoded) - len(waiters) - 1)
+            for _, wait_result in waiters:
+                try:
+                    wait_result()
+                except WorkerCrashed:
+                    pass
+            self._send_error(HTTPStatus.INTERNAL_SERVER_ERROR, "The batch could not be submitted.")
+            return
+        results = []
+        for name, wait_result in waiters:
+            try:
+                result = wait_result()
+            except WorkerCrashed:
+                results.append({'name': name, 'error': "A worker process died; retry this document."})
+                continue
+            if result:
+                results.append({'name': name, 'result': result})
+            else:
+                results.append({'name': name, 'error': "The PDF could not be processed."})
+        self._send_json(HTTPStatus.OK, {'results': results})
+
+def make_server(host, port, service):
+    server = ThreadingHTTPServer((host, port), OutlineRequestHandler)
+    server.daemon_threads = True
+    server.service = service
+    return server
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Worker processes (default: number of cores).")
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE,
+                        help="Documents allowed to wait for a worker before requests get 429.")
+    parser.add_argument('--cache-dir', help="Directory of the result cache.")
+    parser.add_argument('--cache-max-mb', type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024))
+    parser.add_argument('--columnar', action='store_true',
+                        help="Keep the parsed blocks in a compact column store.")
+    parser.add_argument('--use-bookmarks', action='store_true',
+                        help="Use a PDF's embedded bookmarks as its outline when they look reliable.")
+    parser.add_argument('--drop-repeated', action='store_true',
+                        help="Drop running headers, footers and page labels before heading detection.")
+    args = parser.parse_args(argv)
+
+    options = {'columnar': args.columnar, 'use_bookmarks': args.use_bookmarks,
+               'drop_repeated': args.drop_repeated}
+    cache = None
+    if args.cache_dir:
+        cache = ResultCache(args.cache_dir, max_bytes=int(args.cache_max_mb * 1024 * 1024),
+                            version=cache_version(options))
+
+    service = OutlineService(max(1, args.workers), max(0, args.max_queue), cache, options=options)
+    server = make_server(args.host, args.port, service)
+    print(f"Serving on http://{args.host}:{server.server_port} with {service.workers} workers "
+          f"(capacity {service.capacity}).")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nStopping.")
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,90 @@
+import math
+from collections import defaultdict
+
+DEFAULT_CELL_SIZE = 50.0      # Grid cell edge in PDF points.
+MAX_CELLS_PER_RECT = 256      # Larger rects are kept in a short always-checked list instead.
+COLUMN_BUCKET_WIDTH = 10      # x0 positions are rounded to this many points.
+MIN_COLUMN_BLOCKS = 3         # Blocks sharing an x0 bucket at least this often form a column.
+
+class RectIndex:
+    """
+    Uniform grid over a page's drawing rectangles that answers "is this span
+    inside any of the rectangles" without testing every rectangle.
+
+    A rectangle that contains a span also contains the span's top-left corner, so
+    it is enough to check the rectangles registered in that corner's grid cell.
+    The final test is still the rectangle's own contains(), which keeps the
+    result identical to a brute-force scan.
+    """
+
+    def __init__(self, rects, cell_size=DEFAULT_CELL_SIZE):
+        self.rects = list(rects)
+        self.cell_size = cell_size
+        self._cells = defaultdict(list)
+        self._oversized = []
+
+        for rect in self.rects:
+            cells = self._cell_range(rect)
+            if cells is None:
+                self._oversized.append(rect)
+                continue
+            cx0, cy0, cx1, cy1 = cells
+            for cx in range(cx0, cx1 + 1):
+                for cy in range(cy0, cy1 + 1):
+                    self._cells[(cx, cy)].append(rect)
+
+    def __len__(self):
+        return len(self.rects)
+
+    def _cell_range(self, rect):
+        """Returns the inclusive cell range covered by rect, or None if it should not be gridded."""
+        coords = (rect.x0, rect.y0, rect.x1, rect.y1)
+        if not all(math.isfinite(c) for c in coords) or rect.x1 < rect.x0 or rect.y1 < rect.y0:
+            return None
+        cx0 = math.floor(rect.x0 / self.cell_size)
+        cy0 = math.floor(rect.y0 / self.cell_size)
+        cx1 = math.floor(rect.x1 / self.cell_size)
+        cy1 = math.floor(rect.y1 / self.cell_size)
+        if (cx1 - cx0 + 1) * (cy1 - cy0 + 1) > MAX_CELLS_PER_RECT:
+            return None
+        return cx0, cy0, cx1, cy1
+
+    def any_contains(self, rect):
+        """Returns True if any indexed rectangle contains rect (same result as a linear scan)."""
+        if not self.rects:
+            return False
+        if rect.is_empty or not (math.isfinite(rect.x0) and math.isfinite(rect.y0)):
+            # Containment of empty rects does not depend on position; scan them all.
+            return any(r.contains(rect) for r in self.rects)
+
+        for r in self._oversized:
+            if r.contains(rect):
+                return True
+        cell = (math.floor(rect.x0 / self.cell_size), math.floor(rect.y0 / self.cell_size))
+        for r in self._cells.get(cell, ()):
+            if r.contains(rect):
+                return True
+        return False
+
+def column_block_indices(raw_blocks):
+    """
+    Buckets the text blocks of a page by their rounded left edge and returns the
+    indices of blocks whose bucket holds enough blocks to look like a column or table.
+
+    Args:
+        raw_blocks (list): The blocks from page.get_text("dict").
+
+    Returns:
+        set: Indices into raw_blocks of the column-like text blocks.
+    """
+    x_positions = defaultdict(list)
+    for i, block in enumerate(raw_blocks):
+        if block['type'] == 0:
+            x0 = round(block['bbox'][0] / COLUMN_BUCKET_WIDTH) * COLUMN_BUCKET_WIDTH
+            x_positions[x0].append(i)
+
+    column_indices = set()
+    for indices in x_positions.values():
+        if len(indices) >= MIN_COLUMN_BLOCKS:
+            column_indices.update(indices)
+    return column_indices
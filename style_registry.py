@@ -0,0 +1,80 @@
+from operator import itemgetter
+
+BOLD_INDICATORS = ('bold', 'black', 'heavy', 'oblique')
+
+def is_bold(font_name):
+    """Checks if a font name suggests it is bold."""
+    return any(indicator in font_name.lower() for indicator in BOLD_INDICATORS)
+
+class StyleRegistry:
+    """
+    Interns the (font size, font name) styles of a document as small integer IDs,
+    and works out what the detectors need to know about a style once instead of
+    once per span: its size and whether its font is bold.
+
+    StyleStats.add_page registers every parsed block and stores its ID under
+    'style_id', so the detectors compare, count and rank integers instead of
+    rebuilding style tuples and rescanning font names.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._font_bold = {}
+        self.styles = []   # Style ID -> (font size, font name)
+        self.sizes = []
+        self.bold = []
+
+    def __len__(self):
+        return len(self.styles)
+
+    def font_is_bold(self, font_name):
+        """is_bold, computed once per font name."""
+        bold = self._font_bold.get(font_name)
+        if bold is None:
+            bold = self._font_bold[font_name] = is_bold(font_name)
+        return bold
+
+    def intern(self, size, font_name):
+        """Returns the ID of a style, registering it on first use."""
+        style = (size, font_name)
+        style_id = self._ids.get(style)
+        if style_id is None:
+            style_id = len(self.styles)
+            self._ids[style] = style_id
+            self.styles.append(style)
+            self.sizes.append(size)
+            self.bold.append(self.font_is_bold(font_name))
+        return style_id
+
+    def block_style(self, block):
+        """Returns the ID of a block's style, registering it on first use."""
+        return self.intern(block['font_size'], block['font_name'])
+
+    def add_blocks(self, blocks):
+        """Stores the style ID of every block under 'style_id'."""
+        intern = self.intern
+        for block in blocks:
+            block['style_id'] = intern(block['font_size'], block['font_name'])
+
+    def rank(self, style_ids):
+        """
+        Ranks styles by font size, largest first, starting at 0. Styles of the same
+        size keep the order they are given in, so passing them in order of first
+        appearance makes ties deterministic.
+
+        Returns:
+            dict: {style ID: rank}
+        """
+        ordered = sorted(dict.fromkeys(style_ids), key=self.sizes.__getitem__, reverse=True)
+        return {style_id: rank for rank, style_id in enumerate(ordered)}
+
+def style_getter(styles):
+    """
+    Returns (registry, function returning a block's style ID). With the document's
+    registry the IDs stored on the blocks are read; without one, a fresh registry
+    interns the styles as the blocks are read, for blocks built by other callers.
+    """
+    if styles is not None:
+        return styles, itemgetter('style_id')
+    styles = StyleRegistry()
+    return styles, styles.block_style
@@ -1,8 +1,57 @@
 import os
 import json
+import itertools
+from bisect import bisect_left
+from collections import Counter
 from pdf_parser import get_text_blocks
+from block_store import BlockStore
+from style_registry import style_getter
 
-def find_title_blocks(text_blocks, min_font_size):
+def _first_gap_at_least(tops, lo, hi, bottom, threshold):
+    """
+    Binary search over candidate tops sorted ascending: returns the first index j
+    in [lo, hi) with tops[j] - bottom >= threshold, or hi if there is none. The
+    gap is computed exactly like the merge rule computes it.
+    """
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if tops[mid] - bottom >= threshold:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+def _merge_title_lines(candidates, tops, style_positions, start, title_style):
+    """
+    Returns the blocks merged into a title that starts at candidates[start].
+
+    Scanning forward, a block of the title style whose vertical gap to the last
+    merged block is in [0, 1.8 * font size) is merged, and the first block with a
+    gap of at least 1.8 * font size ends the title. Because the candidates are
+    sorted by top, both bounds are binary searches, and the next merged block is
+    the first block of the title style between them.
+
+    (The original loop ends the title at a gap that is > 0 and not close; as
+    candidates are larger than the minimum font size, the threshold is always
+    positive, so that is the same as gap >= threshold.)
+    """
+    positions = style_positions[title_style]
+    merged_blocks = [candidates[start]]
+    last = start
+    while True:
+        last_block = candidates[last]
+        bottom = last_block['bbox'][3]
+        end = _first_gap_at_least(tops, last + 1, len(candidates), bottom, last_block['font_size'] * 1.8)
+        first_below = _first_gap_at_least(tops, last + 1, end, bottom, 0)
+
+        # First position of the title style in [first_below, end).
+        k = bisect_left(positions, first_below)
+        if k == len(positions) or positions[k] >= end:
+            return merged_blocks
+        last = positions[k]
+        merged_blocks.append(candidates[last])
+
+def find_title_blocks(text_blocks, min_font_size, styles=None):
     """
     Identifies title blocks with refined rules:
     - Must be on the first page and in the top 60% of the page.
@@ -10,10 +59,18 @@ def find_title_blocks(text_blocks, min_font_size):
     - Cannot be the last text block on the page.
     - Its font style must not be repeated more than twice on the page.
     - Must contain more than one word.
+
+    Only first-page blocks are used, so a streaming caller can pass just the
+    blocks of page 0 instead of the whole document. From a BlockStore only the
+    page 0 blocks are materialised. styles is the document's StyleRegistry, if
+    the blocks carry its style IDs.
     """
     MAX_TITLE_LEN = 200
     PAGE_ZERO = 0
 
+    if isinstance(text_blocks, BlockStore):
+        text_blocks = text_blocks.blocks(text_blocks.select(page=PAGE_ZERO))
+
     # Step 1: Get all text blocks on the first page, sorted top-to-bottom.
     page_zero_blocks = sorted(
         [b for b in text_blocks if b['page'] == PAGE_ZERO and b.get('text', '').strip()],
@@ -43,32 +100,25 @@ def find_title_blocks(text_blocks, min_font_size):
     if not candidates:
         return []
 
+    # Per-style counts and positions, computed once for all start blocks.
+    _, style_of = style_getter(styles)
+    candidate_styles = [style_of(b) for b in candidates]
+    style_counts = Counter(candidate_styles)
+    style_positions = {}
+    for position, style in enumerate(candidate_styles):
+        style_positions.setdefault(style, []).append(position)
+    tops = [b['bbox'][1] for b in candidates]
+
     # Step 3: Iterate through candidates to find and validate title groups.
     for i, start_block in enumerate(candidates):
-        title_style = (start_block['font_size'], start_block['font_name'])
+        title_style = candidate_styles[i]
         
         # Rule: If the style is too common, it's likely a heading, not a title.
-        style_count = sum(1 for b in candidates if (b['font_size'], b['font_name']) == title_style)
-        if style_count > 3: # Allow for slightly more repetition for complex titles
+        if style_counts[title_style] > 3: # Allow for slightly more repetition for complex titles
             continue
 
         # Step 4: Merge subsequent blocks that are part of the same title.
-        merged_blocks = [start_block]
-        last_merged_block = start_block
-        
-        for j in range(i + 1, len(candidates)):
-            current_block = candidates[j]
-            
-            is_style_match = (current_block['font_size'], current_block['font_name']) == title_style
-            vertical_gap = current_block['bbox'][1] - last_merged_block['bbox'][3]
-            is_vertically_close = 0 <= vertical_gap < (last_merged_block['font_size'] * 1.8)
-
-            if is_style_match and is_vertically_close:
-                merged_blocks.append(current_block)
-                last_merged_block = current_block
-            # Break if a non-matching block is found, as the title has ended.
-            elif vertical_gap > 0 and not is_vertically_close:
-                break
+        merged_blocks = _merge_title_lines(candidates, tops, style_positions, i, title_style)
         
         # --- Final Validation on the MERGED block ---
         
@@ -96,3 +146,22 @@ def find_title_blocks(text_blocks, min_font_size):
 
     # If no candidates passed all rules, return empty.
     return []
+
+def remove_title_blocks(text_blocks, title_blocks):
+    """
+    Returns text_blocks without the title blocks, as a stream in the same order.
+
+    Titles only come from the first page, and blocks are in page order, so only
+    the leading page 0 blocks are checked; the rest are passed through untouched
+    instead of being copied into a new list.
+    """
+    if not title_blocks:
+        return iter(text_blocks)
+    title_block_ids = set(id(b) for b in title_blocks)
+    blocks = iter(text_blocks)
+    first_page = []
+    for block in blocks:
+        if block['page'] != 0:
+            return itertools.chain((b for b in first_page if id(b) not in title_block_ids), [block], blocks)
+        first_page.append(block)
+    return (b for b in first_page if id(b) not in title_block_ids)
@@ -0,0 +1,58 @@
+import os
+
+DEFAULT_POLL_INTERVAL = 1.0
+
+class DirectoryWatcher:
+    """
+    Polls a directory for new or changed files with a given suffix.
+
+    Polling is one os.scandir per interval, which is cheap even for large
+    directories and works on every platform and on mounted volumes where inotify
+    events are not delivered. A file is only reported once its size and
+    modification time are the same on two consecutive polls, so files that are
+    still being copied in are not picked up half-written.
+    """
+
+    def __init__(self, directory, suffix='.pdf'):
+        self.directory = directory
+        self.suffix = suffix.lower()
+        self._seen = {}        # name -> signature at the previous poll
+        self._reported = {}    # name -> signature last returned by poll()
+
+    def _scan(self):
+        signatures = {}
+        try:
+            entries = os.scandir(self.directory)
+        except FileNotFoundError:
+            return signatures
+        with entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(self.suffix):
+                    continue
+                try:
+                    if not entry.is_file():
+                        continue
+                    stat = entry.stat()
+                except OSError:
+                    continue  # Removed between listing and stat.
+                signatures[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+
+    def poll(self):
+        """
+        Returns the names of files that are new or changed since they were last
+        reported and have stopped changing, sorted by name.
+        """
+        current = self._scan()
+        ready = []
+        for name, signature in current.items():
+            if self._seen.get(name) == signature and self._reported.get(name) != signature:
+                self._reported[name] = signature
+                ready.append(name)
+
+        # Forget deleted files, so a file re-added under the same name is processed again.
+        for name in list(self._reported):
+            if name not in current:
+                del self._reported[name]
+        self._seen = current
+        return sorted(ready)